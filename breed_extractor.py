@@ -2,8 +2,8 @@ import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 
-# 빈 데이터프레임 생성
-df = pd.DataFrame(columns=["Breed"])
+# 페이지별 h3 텍스트를 모아 두었다가 마지막에 한 번만 데이터프레임으로 만든다
+breeds = []
 
 for pagenum in range(1, 11):
     url = f"https://www.royalcanin.com/kr/dogs/breeds?page={pagenum}"
@@ -18,8 +18,10 @@ for pagenum in range(1, 11):
     # 모든 h3 태그 텍스트 추출
     h3_texts = [h3.get_text(strip=True) for h3 in soup.find_all("h3")]
 
-    # 페이지의 h3 텍스트를 데이터프레임에 추가
-    df = pd.concat([df, pd.DataFrame(h3_texts, columns=["Breed"])], ignore_index=True)
+    # 페이지의 h3 텍스트를 목록에 추가
+    breeds.extend(h3_texts)
+
+df = pd.DataFrame({"Breed": breeds})
 
 # 데이터프레임을 엑셀 파일로 저장
 excel_file_path = "breeds.xlsx"
@@ -0,0 +1,586 @@
+"""
+nigeria_neo4j_etl.ipynb 의 Neo4j 적재 도우미.
+
+노트북은 친구 / 보증 관계를 행마다 session.run 으로 (보증은 행마다 세션까지 새로)
+MERGE 한다. 여기서는 관계를 batch_size 개씩 묶어 UNWIND $rows 쿼리 하나로
+관리형 쓰기 트랜잭션 (session.execute_write) 안에서 보낸다.
+
+    load_edges(driver, friendships, 'HAS_CONTACT_OF')            # (userId, friendId) 목록
+    load_typed_edges(driver, guarantee_edges(guarantees))        # 배치마다 TRUSTED / LATERED
+
+라벨도 id 마다 f-string 쿼리를 보내는 대신 id 목록을 UNWIND 로 한 번에 붙인다.
+:User(id) 유니크 제약 (인덱스) 을 먼저 만들어 두므로 id 로 찾는 MATCH 는 인덱스 조회가 된다.
+
+    add_labels(driver, salary_users, 'salary_user')
+    add_labels(driver, test_id_list, 'test_user')
+
+bootstrap_schema 는 적재 전에 SCHEMA_STATEMENTS (User 유니크 제약 / 인덱스) 를 만들고
+:User(id) 조회 쿼리의 실행 계획이 라벨 스캔에서 인덱스 조회로 바뀌었는지 출력한다.
+IF NOT EXISTS 라 매번 돌려도 된다.
+
+    bootstrap_schema(driver)
+
+sync_graph 는 매번 전체 user / friendship / guarantee 를 다시 MERGE 하는 대신
+테이블마다 저장해 둔 watermark (max updatedAt) 이후 생기거나 바뀐 행만 읽어
+배치 upsert / 삭제로 반영하고 새 watermark 를 그래프의 (:SyncState) 노드에 저장한다.
+
+    sync_graph(conn, driver)                 # 변경분만 (처음이면 전체)
+    sync_graph(conn, driver, prune=True)     # + Postgres 에서 지워진 User / 관계 정리
+
+User payload 는 노트북처럼 dict 마다 날짜 컬럼 7개를 .isoformat() 하지 않고
+컬럼 단위로 한 번에 문자열로 바꾼 뒤 USER_BATCH_SIZE 행씩 만들어 바로 보낸다.
+
+    upsert_users(driver, df)                                     # DataFrame 또는 DataFrame chunk iterable
+"""
+from datetime import date, datetime
+from itertools import groupby, islice
+
+import numpy as np
+import pandas as pd
+
+# UNWIND 한 번에 보내는 행 수
+EDGE_BATCH_SIZE = 10_000
+LABEL_BATCH_SIZE = 10_000
+USER_BATCH_SIZE = 10_000
+
+# 관계 타입은 쿼리 문자열에 들어가므로 (파라미터로 못 넘김) 이 목록 안에서만 받는다
+RELATIONSHIP_TYPES = ('HAS_CONTACT_OF', 'TRUSTED', 'LATERED', 'HELPED', 'INSTALL_HELPED')
+
+# 붙일 수 있는 User 라벨 (관계 타입과 같은 이유로 목록 안에서만 받는다)
+USER_LABELS = ('salary_user', 'test_user', 'SilverUser')
+
+# :User(id) 유니크 제약. 이미 있으면 아무것도 안 한다
+USER_ID_CONSTRAINT = 'CREATE CONSTRAINT user_id IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE'
+
+# 적재 전에 만드는 제약 / 인덱스 (모두 IF NOT EXISTS).
+#   User.id   : MERGE / MATCH (u:User {id: ...}) 조회 (유니크 제약이 인덱스를 같이 만든다)
+#   User.uuid : uuid 로 찾는 조회
+#   User.usedFirstPromoAt : SilverUser 라벨 쿼리의 IS NOT NULL 조건
+# 관계에는 속성이 없어 관계 속성 인덱스는 아직 필요 없다 (관계는 양 끝 User 로 찾는다)
+SCHEMA_STATEMENTS = [
+    USER_ID_CONSTRAINT,
+    'CREATE CONSTRAINT user_uuid IF NOT EXISTS FOR (u:User) REQUIRE u.uuid IS UNIQUE',
+    'CREATE INDEX user_used_first_promo_at IF NOT EXISTS FOR (u:User) ON (u.usedFirstPromoAt)',
+]
+
+# 인덱스가 ONLINE 이 될 때까지 기다리는 최대 초
+INDEX_WAIT_SECONDS = 300
+
+# 실행 계획 비교용 조회
+USER_ID_PROBE_QUERY = 'MATCH (u:User {id: $id}) RETURN u'
+
+# 두 User 를 id 로 찾아 관계를 MERGE. 한쪽 User 가 없으면 그 행은 건너뛴다 (노트북의 MATCH 와 같음)
+EDGE_QUERY = '''
+    UNWIND $rows AS row
+    MATCH (u:User {{id: row.source}})
+    MATCH (t:User {{id: row.target}})
+    MERGE (u)-[:{rel_type}]->(t)
+'''
+
+# id 목록의 User 에 라벨을 붙인다 (없는 id 는 건너뜀)
+LABEL_QUERY = '''
+    UNWIND $ids AS id
+    MATCH (u:User {{id: id}})
+    SET u{labels}
+'''
+
+# 첫 프로모션을 쓴 User 에 SilverUser 라벨
+SILVER_USER_QUERY = '''
+    MATCH (u:User)
+    WHERE u.usedFirstPromoAt IS NOT NULL AND NOT u:SilverUser
+    SET u:SilverUser
+'''
+
+
+def batches(rows, batch_size):
+    """iterable 을 batch_size 개씩 list 로"""
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+
+def check_rel_types(*rel_types):
+    unknown = [rel_type for rel_type in rel_types if rel_type not in RELATIONSHIP_TYPES]
+    if unknown or not rel_types:
+        raise ValueError(f"알 수 없는 관계 타입입니다: {', '.join(unknown)} ({', '.join(RELATIONSHIP_TYPES)})")
+
+
+def edge_query(rel_type):
+    check_rel_types(rel_type)
+    return EDGE_QUERY.format(rel_type=rel_type)
+
+
+def _write_edges(tx, qry, rows):
+    return tx.run(qry, rows=rows).consume()
+
+
+def write_edge_batch(session, rel_type, pairs):
+    """(source, target) 목록 하나를 트랜잭션 하나로"""
+    rows = [{'source': source, 'target': target} for source, target in pairs]
+    session.execute_write(_write_edges, edge_query(rel_type), rows)
+    return len(rows)
+
+
+def load_edges(driver, pairs, rel_type, batch_size=EDGE_BATCH_SIZE):
+    """
+    (source id, target id) 목록을 rel_type 관계로 적재. 적재 요청한 행 수를 반환.
+    cursor.fetchall() 결과나 DataFrame[[source, target]].itertuples(index=False) 를 그대로 넘기면 된다.
+    """
+    total = 0
+    with driver.session() as session:
+        for batch in batches(pairs, batch_size):
+            total += write_edge_batch(session, rel_type, batch)
+    return total
+
+
+def load_typed_edges(driver, edges, batch_size=EDGE_BATCH_SIZE):
+    """
+    (source id, target id, 관계 타입) 목록을 적재. 같은 타입끼리 모아 배치마다 타입을 정한다.
+    반환: {관계 타입: 행 수}
+    """
+    key = lambda edge: edge[2]
+    counts = {}
+    with driver.session() as session:
+        for rel_type, group in groupby(sorted(edges, key=key), key=key):
+            for batch in batches(((source, target) for source, target, _ in group), batch_size):
+                counts[rel_type] = counts.get(rel_type, 0) + write_edge_batch(session, rel_type, batch)
+    return counts
+
+
+def guarantee_edges(guarantees):
+    """guarantee (userId, guaranteeTargetId, evaluationResult) -> 'trust' 면 TRUSTED, 아니면 LATERED"""
+    return [(user_id, target_id, 'TRUSTED' if result == 'trust' else 'LATERED')
+            for user_id, target_id, result in guarantees]
+
+
+def ensure_user_id_constraint(driver):
+    """:User(id) 유니크 제약이 없으면 만든다"""
+    with driver.session() as session:
+        session.run(USER_ID_CONSTRAINT).consume()
+
+
+def label_query(labels):
+    if isinstance(labels, str):
+        labels = [labels]
+    unknown = [label for label in labels if label not in USER_LABELS]
+    if unknown or not labels:
+        raise ValueError(f"알 수 없는 라벨입니다: {unknown or labels} ({', '.join(USER_LABELS)})")
+    return LABEL_QUERY.format(labels=''.join(f':{label}' for label in labels))
+
+
+def _write_labels(tx, qry, ids):
+    return tx.run(qry, ids=ids).consume()
+
+
+def add_labels(driver, ids, labels, batch_size=LABEL_BATCH_SIZE):
+    """
+    id 목록의 User 에 라벨 (하나 또는 목록) 을 붙인다. 배치마다 UNWIND 쿼리 하나.
+    중복 id 는 한 번만 보낸다. 반환: 보낸 id 수
+    """
+    qry = label_query(labels)
+    ids = list(dict.fromkeys(int(_id) for _id in ids))
+    ensure_user_id_constraint(driver)
+    with driver.session() as session:
+        for batch in batches(ids, batch_size):
+            session.execute_write(_write_labels, qry, batch)
+    return len(ids)
+
+
+def label_silver_users(driver):
+    """usedFirstPromoAt 이 있는 User 에 SilverUser 라벨 (쿼리 한 번)"""
+    with driver.session() as session:
+        return session.execute_write(lambda tx: tx.run(SILVER_USER_QUERY).consume())
+
+
+def plan_operators(driver, qry, **params):
+    """EXPLAIN 으로 얻은 실행 계획의 연산자 이름 목록 (위에서부터, '@neo4j' 같은 접미사 제외)"""
+    with driver.session() as session:
+        plan = session.run('EXPLAIN ' + qry, **params).consume().plan
+
+    operators = []
+
+    def visit(node):
+        operators.append(node['operatorType'].split('@')[0])
+        for child in node.get('children', []):
+            visit(child)
+
+    if plan:
+        visit(plan)
+    return operators
+
+
+def bootstrap_schema(driver, statements=SCHEMA_STATEMENTS, wait_seconds=INDEX_WAIT_SECONDS):
+    """
+    제약 / 인덱스를 만들고 (이미 있으면 그대로) ONLINE 이 될 때까지 기다린다.
+    반환: {'before': [...], 'after': [...]} (USER_ID_PROBE_QUERY 실행 계획 연산자)
+    """
+    before = plan_operators(driver, USER_ID_PROBE_QUERY, id=0)
+    with driver.session() as session:
+        for statement in statements:
+            session.run(statement).consume()
+        session.run('CALL db.awaitIndexes($seconds)', seconds=wait_seconds).consume()
+    after = plan_operators(driver, USER_ID_PROBE_QUERY, id=0)
+
+    print(f"[trust_graph] 제약 / 인덱스 {len(statements)}개 확인")
+    print(f"[trust_graph] :User(id) 조회 계획: {' <- '.join(before)} => {' <- '.join(after)}")
+    return {'before': before, 'after': after}
+
+
+# ---------------------------------------------------------------------------
+# 증분 동기화 (테이블별 updatedAt watermark)
+# ---------------------------------------------------------------------------
+
+# 노트북에서 User 노드로 옮기는 user 컬럼
+USER_COLUMNS = [
+    'id', 'uuid', 'username', 'createdAt', 'firstName', 'middleName', 'lastName', 'birthDate',
+    'bvnCertStatus', 'csChannelVerifiedAt', 'earningCertStatus', 'cbCheckedAt', 'creditLimit',
+    'remainingLimit', 'usedFirstPromoAt', 'membershipLevel', 'helperFriendChosenAt', 'helperId',
+    'installHelperId', 'contactsAppPrivacyAgreedAt', 'helpedUserCount',
+]
+
+# 문자열 (isoformat) 로 바꿔 넣는 날짜 / 시각 컬럼
+USER_TIMESTAMP_COLUMNS = [
+    'createdAt', 'csChannelVerifiedAt', 'cbCheckedAt', 'usedFirstPromoAt', 'birthDate',
+    'contactsAppPrivacyAgreedAt', 'helperFriendChosenAt',
+]
+
+# 각 동기화 쿼리는 행이 생기거나 바뀐 시각을 "syncedAt" 으로 같이 읽는다.
+# {changed} 에는 watermark 가 있을 때만 'AND <syncedAt> >= %(watermark)s' 가 들어간다.
+# (>= 라 watermark 와 같은 시각의 행은 다시 읽지만 MERGE 라 결과는 같다)
+USER_SYNC_QUERY = '''
+    SELECT "id", "uuid", "username", "createdAt", "firstName", "middleName", "lastName", "birthDate",
+        "bvnCertStatus", "csChannelVerifiedAt", "earningCertStatus", "cbCheckedAt", "creditLimit",
+        "remainingLimit", "usedFirstPromoAt", "membershipLevel", "helperFriendChosenAt", "helperId",
+        "installHelperId", "contactsAppPrivacyAgreedAt", "helpedUserCount",
+        COALESCE("updatedAt", "createdAt") AS "syncedAt"
+    FROM "user"
+    WHERE TRUE {changed}
+'''
+
+FRIENDSHIP_SYNC_QUERY = '''
+    SELECT "friendship"."userId", "friendship"."friendId",
+        COALESCE("friendship"."updatedAt", "friendship"."createdAt") AS "syncedAt"
+    FROM "friendship"
+    INNER JOIN "personal_identifier" "friend" ON "friendship"."friendId" = "friend"."userId"
+    WHERE "friend"."userId" IS NOT NULL {changed}
+'''
+
+# 증분일 때는 evaluationResult 가 NULL 로 돌아간 행도 읽어 관계를 지운다
+GUARANTEE_SYNC_QUERY = '''
+    SELECT "userId", "guaranteeTargetId", "evaluationResult",
+        COALESCE("updatedAt", "createdAt") AS "syncedAt"
+    FROM "guarantee"
+    WHERE TRUE {changed}
+'''
+
+SYNC_QUERIES = {
+    'user': (USER_SYNC_QUERY, 'COALESCE("updatedAt", "createdAt")'),
+    'friendship': (FRIENDSHIP_SYNC_QUERY, 'COALESCE("friendship"."updatedAt", "friendship"."createdAt")'),
+    'guarantee': (GUARANTEE_SYNC_QUERY, 'COALESCE("updatedAt", "createdAt")'),
+}
+
+# 노트북 셀 4 의 User MERGE
+USER_UPSERT_QUERY = '''
+    UNWIND $users AS user
+    MERGE (u:User {id: user.id})
+    SET u.uuid = user.uuid,
+        u.username = user.username,
+        u.createdAt = user.createdAt,
+        u.firstName = user.firstName,
+        u.middleName = user.middleName,
+        u.lastName = user.lastName,
+        u.birthDate = user.birthDate,
+        u.bvnCertStatus = user.bvnCertStatus,
+        u.csChannelVerifiedAt = user.csChannelVerifiedAt,
+        u.earningCertStatus = user.earningCertStatus,
+        u.cbCheckedAt = user.cbCheckedAt,
+        u.creditLimit = user.creditLimit,
+        u.remainingLimit = user.remainingLimit,
+        u.usedFirstPromoAt = user.usedFirstPromoAt,
+        u.membershipLevel = user.membershipLevel,
+        u.contactsAppPrivacyAgreedAt = user.contactsAppPrivacyAgreedAt,
+        u.helperFriendChosenAt = user.helperFriendChosenAt
+'''
+
+# 두 User 사이의 rel_types 관계를 지운다
+DELETE_EDGE_QUERY = '''
+    UNWIND $rows AS row
+    MATCH (u:User {{id: row.source}})-[r:{rel_types}]->(t:User {{id: row.target}})
+    DELETE r
+'''
+
+# User 에서 나가는 rel_types 관계를 모두 지운다 (helperId 가 바뀐 User)
+DELETE_OUT_EDGE_QUERY = '''
+    UNWIND $ids AS id
+    MATCH (u:User {{id: id}})-[r:{rel_types}]->()
+    DELETE r
+'''
+
+DELETE_USER_QUERY = '''
+    UNWIND $ids AS id
+    MATCH (u:User {id: id})
+    DETACH DELETE u
+'''
+
+GRAPH_USER_IDS_QUERY = 'MATCH (u:User) RETURN u.id AS id'
+GRAPH_EDGES_QUERY = 'MATCH (u:User)-[r:{rel_type}]->(t:User) RETURN u.id AS source, t.id AS target'
+
+WATERMARK_READ_QUERY = 'MATCH (s:SyncState) RETURN s.table AS table, s.watermark AS watermark'
+WATERMARK_WRITE_QUERY = '''
+    MERGE (s:SyncState {table: $table})
+    SET s.watermark = $watermark, s.syncedAt = datetime()
+'''
+
+
+def fetch_rows(conn, qry, params=None):
+    """쿼리 결과를 DataFrame 으로 (실패 시 rollback)"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(qry, params)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+    except Exception:
+        conn.rollback()
+        raise
+    return pd.DataFrame(rows, columns=columns)
+
+
+def fetch_changed(conn, table, watermark=None):
+    """table 에서 watermark 이후 생기거나 바뀐 행 (watermark 가 None 이면 전체)"""
+    qry, synced_at = SYNC_QUERIES[table]
+    if watermark is None:
+        return fetch_rows(conn, qry.format(changed=''))
+    return fetch_rows(conn, qry.format(changed=f'AND {synced_at} >= %(watermark)s'), {'watermark': watermark})
+
+
+def read_watermarks(driver):
+    """{테이블: watermark datetime} (저장된 적 없는 테이블은 없음)"""
+    with driver.session() as session:
+        records = session.execute_read(lambda tx: tx.run(WATERMARK_READ_QUERY).data())
+    return {record['table']: datetime.fromisoformat(record['watermark'])
+            for record in records if record['watermark']}
+
+
+def save_watermark(driver, table, watermark):
+    with driver.session() as session:
+        session.execute_write(lambda tx: tx.run(WATERMARK_WRITE_QUERY, table=table,
+                                                watermark=watermark.isoformat()).consume())
+
+
+def iso_strings(values):
+    """
+    날짜 / 시각 컬럼 -> 값마다 .isoformat() 한 것과 같은 문자열 배열 (없으면 None).
+    np.datetime_as_string 으로 한 번에 만들고, 마이크로초가 0 이면 잘라내고,
+    tz 가 있으면 UTC offset (+01:00) 도 배열 연산으로 붙인다.
+    datetime.date 컬럼은 YYYY-MM-DD. 날짜가 아닌 값 (이미 문자열 등) 은 그대로 둔다.
+    """
+    series = pd.Series(values).reset_index(drop=True)
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        present = series.dropna()
+        first = present.iloc[0] if len(present) else None
+        if isinstance(first, date) and not isinstance(first, datetime):
+            days = series.where(series.notna(), None).to_numpy(dtype='datetime64[D]')
+            text = np.datetime_as_string(days, unit='D').astype(object)
+            text[np.isnat(days)] = None
+            return text
+        if not isinstance(first, datetime):
+            text = series.to_numpy(dtype=object, copy=True)
+            text[series.isna().to_numpy()] = None
+            return text
+        try:
+            series = pd.to_datetime(series)
+        except (ValueError, TypeError):
+            # offset 이 행마다 다른 경우 등은 값마다 변환
+            return np.array([value.isoformat() if pd.notna(value) else None for value in series], dtype=object)
+
+    tz = series.dt.tz
+    wall = series.dt.tz_localize(None) if tz is not None else series
+    missing = wall.isna().to_numpy()
+    text = np.datetime_as_string(wall.to_numpy(dtype='datetime64[us]'), unit='us')
+    text = np.where(wall.dt.microsecond.to_numpy() == 0, text.astype('U19'), text)
+    if tz is not None:
+        utc = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        offset = ((wall - utc) // pd.Timedelta(minutes=1)).fillna(0).to_numpy(dtype=np.int64)
+        hours, minutes = np.divmod(np.abs(offset), 60)
+        text = np.char.add(text, np.where(offset < 0, '-', '+'))
+        text = np.char.add(text, np.char.zfill(hours.astype(str), 2))
+        text = np.char.add(np.char.add(text, ':'), np.char.zfill(minutes.astype(str), 2))
+    text = text.astype(object)
+    text[missing] = None
+    return text
+
+
+def user_rows(frame):
+    """
+    user DataFrame -> USER_UPSERT_QUERY 의 $users.
+    날짜 / 시각 컬럼은 iso_strings 로 컬럼째 바꾸고, 비어 있는 값 (NaN / NaT) 은 None 으로 보낸다.
+    """
+    payload = frame[USER_COLUMNS].astype(object)
+    payload = payload.where(payload.notna(), None)
+    for column in USER_TIMESTAMP_COLUMNS:
+        # object 로 지정하지 않으면 pandas 가 str dtype 으로 바꾸며 None 이 NaN 이 된다
+        payload[column] = pd.Series(iso_strings(frame[column]), index=payload.index, dtype=object)
+    return payload.to_dict(orient='records')
+
+
+def user_payloads(frame, chunksize=USER_BATCH_SIZE):
+    """user DataFrame 을 chunksize 행씩 잘라 user_rows 로 (큰 테이블도 payload 를 한 번에 다 만들지 않음)"""
+    for start in range(0, len(frame), chunksize):
+        yield user_rows(frame.iloc[start:start + chunksize])
+
+
+def _run_rows(tx, qry, **params):
+    return tx.run(qry, **params).consume()
+
+
+def upsert_users(driver, frames, batch_size=USER_BATCH_SIZE):
+    """
+    user 행을 batch_size 개씩 User 노드로 MERGE. 반환: 행 수.
+    frames 는 DataFrame 하나 또는 DataFrame chunk 의 iterable (예: trusty_db.iter_frames).
+    배치마다 payload 를 만들어 바로 보낸다.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    total = 0
+    with driver.session() as session:
+        for frame in frames:
+            for batch in user_payloads(frame, batch_size):
+                session.execute_write(_run_rows, USER_UPSERT_QUERY, users=batch)
+            total += len(frame)
+    return total
+
+
+def delete_edges(driver, pairs, rel_types, batch_size=EDGE_BATCH_SIZE):
+    """(source, target) 사이의 rel_types 관계 삭제. 반환: 요청한 행 수"""
+    check_rel_types(*rel_types)
+    qry = DELETE_EDGE_QUERY.format(rel_types='|'.join(rel_types))
+    total = 0
+    with driver.session() as session:
+        for batch in batches(pairs, batch_size):
+            session.execute_write(_run_rows, qry, rows=[{'source': s, 'target': t} for s, t in batch])
+            total += len(batch)
+    return total
+
+
+def delete_out_edges(driver, ids, rel_types, batch_size=EDGE_BATCH_SIZE):
+    """ids User 에서 나가는 rel_types 관계 삭제"""
+    check_rel_types(*rel_types)
+    qry = DELETE_OUT_EDGE_QUERY.format(rel_types='|'.join(rel_types))
+    with driver.session() as session:
+        for batch in batches(ids, batch_size):
+            session.execute_write(_run_rows, qry, ids=batch)
+
+
+def helper_edges(users):
+    """user 행의 helperId / installHelperId -> (id, helper id, HELPED / INSTALL_HELPED)"""
+    edges = []
+    for column, rel_type in [('helperId', 'HELPED'), ('installHelperId', 'INSTALL_HELPED')]:
+        helped = users[users[column].notna()]
+        edges += [(int(user_id), int(helper_id), rel_type)
+                  for user_id, helper_id in zip(helped['id'], helped[column])]
+    return edges
+
+
+def sync_users(conn, driver, watermark, batch_size=EDGE_BATCH_SIZE, user_batch_size=USER_BATCH_SIZE):
+    """
+    바뀐 user 를 user_batch_size 개씩 MERGE 하고 그 User 의 HELPED / INSTALL_HELPED 관계를
+    batch_size 개씩 다시 만든다
+    """
+    users = fetch_changed(conn, 'user', watermark)
+    upsert_users(driver, users, user_batch_size)
+    if watermark is not None:
+        delete_out_edges(driver, [int(_id) for _id in users['id']], ['HELPED', 'INSTALL_HELPED'], batch_size)
+    load_typed_edges(driver, helper_edges(users), batch_size)
+    return users
+
+
+def sync_friendships(conn, driver, watermark, batch_size=EDGE_BATCH_SIZE):
+    friendships = fetch_changed(conn, 'friendship', watermark)
+    load_edges(driver, zip(friendships['userId'], friendships['friendId']), 'HAS_CONTACT_OF', batch_size)
+    return friendships
+
+
+def sync_guarantees(conn, driver, watermark, batch_size=EDGE_BATCH_SIZE):
+    """
+    바뀐 guarantee 의 TRUSTED / LATERED 관계를 지우고 evaluationResult 에 맞게 다시 만든다
+    (결과가 trust <-> 그 외로 바뀌었거나 NULL 로 돌아간 경우)
+    """
+    guarantees = fetch_changed(conn, 'guarantee', watermark)
+    pairs = list(zip(guarantees['userId'], guarantees['guaranteeTargetId']))
+    if watermark is not None:
+        delete_edges(driver, pairs, ['TRUSTED', 'LATERED'], batch_size)
+    evaluated = guarantees[guarantees['evaluationResult'].notna()]
+    load_typed_edges(driver, guarantee_edges(
+        zip(evaluated['userId'], evaluated['guaranteeTargetId'], evaluated['evaluationResult'])), batch_size)
+    return guarantees
+
+
+def graph_rows(driver, qry):
+    with driver.session() as session:
+        return session.execute_read(lambda tx: tx.run(qry).data())
+
+
+def prune_graph(conn, driver, batch_size=EDGE_BATCH_SIZE):
+    """
+    Postgres 에서 지워진 user / friendship / guarantee 를 그래프에서도 지운다.
+    양쪽 id (쌍) 만 읽어 비교한다 (watermark 로는 지워진 행을 알 수 없기 때문).
+    반환: {'user': 지운 수, 'HAS_CONTACT_OF': ..., 'TRUSTED': ..., 'LATERED': ...}
+    """
+    pruned = {}
+    source_ids = set(int(_id) for _id in fetch_rows(conn, 'SELECT "id" FROM "user"')['id'])
+    stale_ids = [record['id'] for record in graph_rows(driver, GRAPH_USER_IDS_QUERY)
+                 if record['id'] not in source_ids]
+    with driver.session() as session:
+        for batch in batches(stale_ids, batch_size):
+            session.execute_write(_run_rows, DELETE_USER_QUERY, ids=batch)
+    pruned['user'] = len(stale_ids)
+
+    friendships = fetch_changed(conn, 'friendship')
+    guarantees = fetch_changed(conn, 'guarantee')
+    guarantees = guarantees[guarantees['evaluationResult'].notna()]
+    source_edges = {'HAS_CONTACT_OF': set(zip(friendships['userId'], friendships['friendId']))}
+    for source, target, rel_type in guarantee_edges(
+            zip(guarantees['userId'], guarantees['guaranteeTargetId'], guarantees['evaluationResult'])):
+        source_edges.setdefault(rel_type, set()).add((source, target))
+    for rel_type in ['HAS_CONTACT_OF', 'TRUSTED', 'LATERED']:
+        graph_edges = {(record['source'], record['target'])
+                       for record in graph_rows(driver, GRAPH_EDGES_QUERY.format(rel_type=rel_type))}
+        stale = graph_edges - source_edges.get(rel_type, set())
+        pruned[rel_type] = delete_edges(driver, stale, [rel_type], batch_size)
+    return pruned
+
+
+def sync_graph(conn, driver, full=False, prune=False, batch_size=EDGE_BATCH_SIZE,
+               user_batch_size=USER_BATCH_SIZE):
+    """
+    user -> friendship -> guarantee 순서로 watermark 이후 바뀐 행만 반영하고
+    테이블마다 반영이 끝난 뒤 새 watermark (읽은 행의 max syncedAt) 를 저장한다.
+    full 이거나 저장된 watermark 가 없으면 그 테이블은 전체를 읽는다.
+    prune 이면 Postgres 에서 지워진 User / 관계도 정리한다 (전체 id 비교라 가끔만).
+    User 노드는 user_batch_size, 관계는 batch_size 개씩 보낸다.
+
+    watermark 는 Postgres 쪽 "updatedAt" (없으면 "createdAt") 값이고 다음 실행은
+    syncedAt >= watermark 인 행을 읽는다. 그래서 늦게 커밋된 트랜잭션이 watermark 보다
+    이른 "updatedAt" 으로 남긴 행은 건너뛴다. 그런 행은 full=True 실행에서 반영된다
+    (prune=True 는 지워진 User / 관계를 정리할 뿐 빠진 행을 채우지 않는다).
+    반환: {테이블: 반영한 행 수, ...}
+    """
+    ensure_user_id_constraint(driver)
+    marks = {} if full else read_watermarks(driver)
+    counts = {}
+    syncs = [
+        ('user', lambda watermark: sync_users(conn, driver, watermark, batch_size, user_batch_size)),
+        ('friendship', lambda watermark: sync_friendships(conn, driver, watermark, batch_size)),
+        ('guarantee', lambda watermark: sync_guarantees(conn, driver, watermark, batch_size)),
+    ]
+    for table, sync in syncs:
+        rows = sync(marks.get(table))
+        counts[table] = len(rows)
+        watermark = rows['syncedAt'].max() if len(rows) else None
+        if pd.notna(watermark):
+            save_watermark(driver, table, pd.Timestamp(watermark).to_pydatetime())
+    if prune:
+        counts['pruned'] = prune_graph(conn, driver, batch_size)
+
+    print(f"[trust_graph] 동기화: {counts}")
+    return counts
@@ -0,0 +1,229 @@
+"""
+잔고 룰 컬럼 단위 평가.
+
+balance_rule_ver1.1.py / 잔고 룰 측정.py 의
+enhanced_financial_soundness / enhanced_volatility_patterns 를
+유저별 groupby.apply 대신 전체 배열에 대해 한 번에 계산한다.
+
+  - user_id 로 한 번만 (stable) 정렬 -> 유저 안의 행 순서는 파일 순서 그대로
+  - 평균 / 중앙값 / 비율은 groupby().agg
+  - 최장 연속 하락 일수는 전체 배열에 대한 run-length 계산 (유저 경계에서 끊음)
+
+    data = pd.read_csv('all_users_daily_balance.csv')
+    scores = evaluate_balance_rules(data)
+
+기준값 튜닝용 sweep_thresholds 는 유저별 통계를 한 번만 만들고
+(유저 x 기준값 조합) 행렬로 모든 조합의 precision / recall 을 한 번에 구한다.
+CLI 는 balance_sweep.py 참고.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# balance_rule_ver1.1.py 에 하드코딩되어 있던 기준값
+THRESHOLDS = {
+    'high_mean': 10000,      # high_path: 평균 잔고 >=
+    'high_median': 2000,     # high_path: 중앙값 잔고 >=
+    'stable_mean': 3000,     # stability_path: 평균 잔고 >=
+    'stable_ratio': 0.3,     # stability_path: 중앙값 이상인 날 비율 >=
+    'critical_ratio': 0.15,  # stability_path: 저 잔고 날 비율 <=
+    'max_drops': 15,         # 변동성: 최장 연속 하락 일수 <=
+    'low_ratio': 0.3,        # 변동성: 저 잔고 날 비율 <=
+}
+
+# 저 잔고 기준 (critical_ratio, low_ratio 모두 이 값 미만인 날의 비율)
+LOW_BALANCE = 500
+
+# sweep_thresholds 기본 탐색 범위 (THRESHOLDS 의 키 + low_balance)
+SWEEP_GRID = {
+    'high_mean': [5000, 7500, 10000, 15000, 20000],
+    'high_median': [1000, 2000, 3000, 5000],
+    'stable_mean': [1000, 2000, 3000, 5000],
+    'stable_ratio': [0.2, 0.3, 0.4, 0.5],
+    'critical_ratio': [0.05, 0.1, 0.15, 0.2, 0.3],
+    'max_drops': [5, 10, 15, 20, 30],
+    'low_ratio': [0.1, 0.2, 0.3, 0.4],
+    'low_balance': [200, 500, 1000],
+}
+
+# sweep 블록 하나에 쓸 메모리 예산 (바이트). 한 번에 평가할 기준값 조합 수는
+# 이 예산을 (유저 수 x SWEEP_BYTES_PER_CELL) 로 나눠 정한다 (sweep_block_size)
+SWEEP_MEMORY_BYTES = 512 << 20
+
+# (유저, 조합) 칸 하나가 블록 안에서 동시에 차지하는 바이트
+# (low_ratio float64 8 + 룰 중간 결과 bool 행렬 여러 개)
+SWEEP_BYTES_PER_CELL = 16
+
+
+def sort_by_user(data):
+    """user_id 로 stable 정렬 (유저 안의 순서는 유지)"""
+    return data.sort_values('user_id', kind='stable', ignore_index=True)
+
+
+def drop_run_lengths(user_ids, balances):
+    """
+    행마다 '이 행에서 끝나는 연속 하락 구간 길이'를 반환.
+    하락 = 같은 유저의 직전 행보다 잔고가 작음 (np.diff(balances) < 0 과 동일).
+    user_ids 는 같은 유저끼리 붙어 있어야 한다.
+    """
+    n = len(balances)
+    drop = np.zeros(n, dtype=bool)
+    if n > 1:
+        drop[1:] = (balances[1:] < balances[:-1]) & (user_ids[1:] == user_ids[:-1])
+
+    # 마지막으로 하락이 아니었던 위치까지의 거리 = 현재 하락 구간 길이
+    positions = np.arange(n)
+    last_reset = np.maximum.accumulate(np.where(drop, -1, positions))
+    return positions - last_reset
+
+
+def balance_stats(data, low_balance=LOW_BALANCE):
+    """
+    유저별 잔고 통계.
+    index=user_id, columns=mean_balance, median_balance, stable_ratio,
+    low_ratio, max_consecutive_drops
+    """
+    data = sort_by_user(data[['user_id', 'balance']])
+    balance = data['balance']
+    median = data.groupby('user_id', sort=False)['balance'].transform('median')
+
+    rows = pd.DataFrame({
+        'user_id': data['user_id'],
+        'balance': balance,
+        'is_stable': balance >= median,
+        'is_low': balance < low_balance,
+        'drop_run': drop_run_lengths(data['user_id'].to_numpy(), balance.to_numpy()),
+    })
+    return rows.groupby('user_id').agg(
+        mean_balance=('balance', 'mean'),
+        median_balance=('balance', 'median'),
+        stable_ratio=('is_stable', 'mean'),
+        low_ratio=('is_low', 'mean'),
+        max_consecutive_drops=('drop_run', 'max'),
+    )
+
+
+def financial_soundness(stats, thresholds=THRESHOLDS):
+    """강화된 재무 건전성 (high_path or stability_path)"""
+    high_path = ((stats['mean_balance'] >= thresholds['high_mean']) &
+                 (stats['median_balance'] >= thresholds['high_median']))
+    stability_path = ((stats['mean_balance'] >= thresholds['stable_mean']) &
+                      (stats['stable_ratio'] >= thresholds['stable_ratio']) &
+                      (stats['low_ratio'] <= thresholds['critical_ratio']))
+    return high_path | stability_path
+
+
+def volatility_patterns(stats, thresholds=THRESHOLDS):
+    """강화된 변동성 패턴 (연속 하락 일수 + 저 잔고 비율)"""
+    return ((stats['max_consecutive_drops'] <= thresholds['max_drops']) &
+            (stats['low_ratio'] <= thresholds['low_ratio']))
+
+
+def evaluate_balance_rules(data, thresholds=THRESHOLDS):
+    """
+    user_id / balance 일별 데이터 -> 유저별 룰 결과.
+    index=user_id, columns=enhanced_financial_soundness,
+    enhanced_volatility_patterns, rule_satisfaction
+    """
+    stats = balance_stats(data)
+    scores = pd.DataFrame({
+        'enhanced_financial_soundness': financial_soundness(stats, thresholds),
+        'enhanced_volatility_patterns': volatility_patterns(stats, thresholds),
+    })
+    scores['rule_satisfaction'] = (
+        scores['enhanced_financial_soundness'] &
+        scores['enhanced_volatility_patterns']
+    )
+    return scores
+
+
+# ---------------------------------------------------------------------------
+# 기준값 sweep
+# ---------------------------------------------------------------------------
+
+def threshold_grid(axes=SWEEP_GRID):
+    """{기준값 이름: 후보 리스트} -> 모든 조합 DataFrame (조합당 한 행)"""
+    names = list(axes)
+    return pd.DataFrame(list(itertools.product(*(axes[name] for name in names))), columns=names)
+
+
+def low_ratio_matrix(data, low_balances):
+    """유저별로 잔고 < low_balance 인 날의 비율. index=user_id, columns=low_balances"""
+    balance = data['balance'].to_numpy()
+    is_low = pd.DataFrame(balance[:, None] < np.asarray(low_balances)[None, :],
+                          columns=list(low_balances))
+    is_low['user_id'] = data['user_id'].to_numpy()
+    return is_low.groupby('user_id').mean()
+
+
+def sweep_block_size(n_users, memory_bytes=SWEEP_MEMORY_BYTES):
+    """유저 x 조합 블록이 memory_bytes 안에 들어가는 조합 수 (최소 1)"""
+    return max(1, memory_bytes // (max(n_users, 1) * SWEEP_BYTES_PER_CELL))
+
+
+def sweep_thresholds(data, positive_cases, grid=None, memory_bytes=SWEEP_MEMORY_BYTES, block_size=None):
+    """
+    기준값 조합별 precision / recall.
+    grid 는 threshold_grid() 형태 (기본: SWEEP_GRID 전체 조합).
+    grid 에 없는 기준값은 THRESHOLDS / LOW_BALANCE 로 고정.
+    positive_cases 에 없는 유저는 모두 음성 (balance_rule_ver1.1.py 의 true_label 과 동일).
+    조합은 block_size 개씩 평가한다 (기본: memory_bytes 와 유저 수로 sweep_block_size).
+    반환: grid 컬럼 + tp, fp, fn, predicted, precision, recall, f1
+    """
+    if grid is None:
+        grid = threshold_grid()
+    defaults = {**THRESHOLDS, 'low_balance': LOW_BALANCE}
+    grid = grid.reset_index(drop=True).assign(
+        **{name: value for name, value in defaults.items() if name not in grid})
+
+    stats = balance_stats(data)
+    if block_size is None:
+        block_size = sweep_block_size(len(stats), memory_bytes)
+    low_balances = np.unique(grid['low_balance'].to_numpy())
+    low = low_ratio_matrix(data, low_balances).reindex(stats.index).to_numpy()
+    low_col = np.searchsorted(low_balances, grid['low_balance'].to_numpy())
+
+    # (유저, 1) 열벡터 -> (1, 조합) 행벡터와 브로드캐스트
+    mean = stats['mean_balance'].to_numpy()[:, None]
+    median = stats['median_balance'].to_numpy()[:, None]
+    stable = stats['stable_ratio'].to_numpy()[:, None]
+    drops = stats['max_consecutive_drops'].to_numpy()[:, None]
+    label = stats.index.isin(positive_cases)[:, None]
+
+    tp, predicted = [], []
+    for start in range(0, len(grid), block_size):
+        t = {name: grid[name].to_numpy()[start:start + block_size][None, :] for name in THRESHOLDS}
+        low_ratio = low[:, low_col[start:start + block_size]]
+
+        high_path = (mean >= t['high_mean']) & (median >= t['high_median'])
+        stability_path = ((mean >= t['stable_mean']) & (stable >= t['stable_ratio']) &
+                          (low_ratio <= t['critical_ratio']))
+        volatility = (drops <= t['max_drops']) & (low_ratio <= t['low_ratio'])
+        prediction = (high_path | stability_path) & volatility
+
+        tp.append((prediction & label).sum(axis=0))
+        predicted.append(prediction.sum(axis=0))
+
+    result = grid.copy()
+    result['tp'] = np.concatenate(tp) if tp else np.array([], dtype=int)
+    result['predicted'] = np.concatenate(predicted) if predicted else np.array([], dtype=int)
+    result['fp'] = result['predicted'] - result['tp']
+    result['fn'] = int(label.sum()) - result['tp']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(result['predicted'] > 0, result['tp'] / result['predicted'], 0.0)
+        recall = np.where(result['tp'] + result['fn'] > 0, result['tp'] / (result['tp'] + result['fn']), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    result['precision'] = precision
+    result['recall'] = recall
+    result['f1'] = f1
+    return result
+
+
+def threshold_surface(sweep, x, y, value='f1', agg='max'):
+    """
+    sweep 결과를 (y x x) 2차원 표로 접는다.
+    나머지 기준값 축은 agg (기본: 그 칸에서 가능한 최대값) 로 줄인다.
+    """
+    return sweep.pivot_table(index=y, columns=x, values=value, aggfunc=agg)
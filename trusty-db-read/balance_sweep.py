@@ -0,0 +1,70 @@
+"""
+잔고 룰 기준값 sweep CLI.
+
+유저별 잔고 통계를 한 번만 만들고 SWEEP_GRID 의 모든 기준값 조합에 대해
+precision / recall 을 구한다. balance_rule_ver1.1.py 의 기준값을 고치고
+다시 돌리는 대신 이 결과에서 조합을 고른다.
+
+    python balance_sweep.py                                   # 기본 그리드 전체
+    python balance_sweep.py --output sweep.csv --surface max_drops low_ratio
+    python balance_sweep.py --positive 523 546 539 --top 30
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from balance_rules import LOW_BALANCE, THRESHOLDS, sweep_thresholds, threshold_surface
+
+# balance_rule_ver1.1.py 의 positive_cases
+POSITIVE_CASES = [523, 546, 539, 559, 577, 600, 612, 580, 549]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='잔고 룰 기준값 조합별 precision/recall')
+    parser.add_argument('--input', default='all_users_daily_balance.csv', help='user_id, date, balance CSV')
+    parser.add_argument('--positive', nargs='*', type=int, default=POSITIVE_CASES, help='양성 user_id 목록')
+    parser.add_argument('--min-precision', type=float, default=0.0, help='상위 조합 출력 시 최소 precision')
+    parser.add_argument('--top', type=int, default=20, help='f1 상위 몇 개 조합을 출력할지')
+    parser.add_argument('--surface', nargs=2, metavar=('X', 'Y'), default=None,
+                        help='두 기준값 축에 대한 precision / recall / f1 최대값 표 출력')
+    parser.add_argument('--output', default=None, help='전체 sweep 결과를 저장할 CSV 경로')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    start = time.perf_counter()
+    data = pd.read_csv(args.input)
+    loaded = time.perf_counter()
+
+    sweep = sweep_thresholds(data, args.positive)
+    swept = time.perf_counter()
+
+    print(f"=== {len(sweep)}개 기준값 조합 (users={data['user_id'].nunique()}, 양성={len(args.positive)}) ===")
+    best = sweep[sweep['precision'] >= args.min_precision]
+    best = best.sort_values(['f1', 'precision'], ascending=False).head(args.top)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(best.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+        if args.surface:
+            x, y = args.surface
+            for value in ['precision', 'recall', 'f1']:
+                print(f"\n--- {value} (최대값, 행={y}, 열={x}) ---")
+                print(threshold_surface(sweep, x, y, value).to_string(float_format=lambda v: f"{v:.3f}"))
+
+    current = sweep[(sweep[list(THRESHOLDS)] == pd.Series(THRESHOLDS)).all(axis=1) &
+                    (sweep['low_balance'] == LOW_BALANCE)]
+    if len(current):
+        row = current.iloc[0]
+        print(f"\n현재 기준값: precision={row['precision']:.4f}, recall={row['recall']:.4f}")
+
+    print(f"(로드 {loaded - start:.2f}s, sweep {swept - loaded:.2f}s)")
+
+    if args.output:
+        sweep.to_csv(args.output, index=False, encoding='utf-8-sig')
+
+
+if __name__ == "__main__":
+    main()
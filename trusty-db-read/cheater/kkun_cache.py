@@ -0,0 +1,117 @@
+"""
+꾼 라벨 데이터 피처 캐시.
+
+CSV 를 읽고 날짜 파싱 / 피처 생성까지 끝난 결과를 Parquet 으로 저장해 두고,
+다음 실행부터는 Parquet 만 읽는다.
+
+캐시 키 = 입력 파일 내용의 sha256 + kkun_rules.FEATURE_VERSION
+  - CSV 내용이 바뀌거나 FEATURE_VERSION 을 올리면 키가 달라져 자동으로 다시 만든다
+  - 같은 입력의 예전 캐시 파일은 새로 만들 때 지운다
+    (파일 이름 prefix 에 입력 경로 digest 를 넣어, 이름이 같은 다른 경로의 입력이나
+     이름이 prefix 로 겹치는 입력의 캐시는 건드리지 않는다)
+
+    feature_df = load_features_cached('꾼.csv', 'gpt-playground/꾼아님_282제외.csv')
+"""
+import hashlib
+import os
+import re
+
+import pandas as pd
+
+from kkun_rules import FEATURE_VERSION, add_early_repay_flag, aggregate_features, load_labeled_csv
+
+CACHE_DIR = '.kkun_cache'
+
+# Parquet 으로 저장하지 못하는 경우 (엔진 없음 / 섞인 타입의 object 컬럼 등) -> 캐시 없이 진행
+try:
+    import pyarrow
+    PARQUET_ERRORS = (ImportError, pyarrow.lib.ArrowException)
+except ImportError:
+    PARQUET_ERRORS = (ImportError,)
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """파일 내용의 sha256 (앞 16자리)"""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def cache_key(*parts):
+    """입력 파일 digest 들 + FEATURE_VERSION 으로 캐시 키 생성"""
+    raw = '|'.join([str(p) for p in parts] + [f'v{FEATURE_VERSION}'])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def file_stem(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def path_digest(*file_paths):
+    """입력 파일 절대 경로들의 sha256 (앞 8자리). 같은 이름의 다른 경로 파일을 구분한다"""
+    raw = '|'.join(os.path.abspath(p) for p in file_paths)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:8]
+
+
+def cached_frame(cache_dir, prefix, key, build):
+    """
+    {cache_dir}/{prefix}-{key}.parquet 이 있으면 읽고, 없으면 build() 결과를 저장.
+    정확히 {prefix}-<16자리 hex>.parquet 인 다른 키 파일(이전 버전)만 지운다.
+    Parquet 엔진(pyarrow 등)이 없거나 frame 을 Parquet 으로 쓸 수 없으면 (섞인 타입의 object 컬럼 등)
+    캐시 없이 build() 결과를 그대로 반환.
+    """
+    cache_path = os.path.join(cache_dir, f'{prefix}-{key}.parquet')
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    frame = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    try:
+        frame.to_parquet(tmp_path, index=False)
+    except PARQUET_ERRORS as e:
+        print(f"[kkun_cache] Parquet 저장 불가, 캐시 없이 진행: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return frame
+    os.replace(tmp_path, cache_path)
+
+    stale_name = re.compile(re.escape(prefix) + r'-[0-9a-f]{16}\.parquet')
+    for name in os.listdir(cache_dir):
+        if stale_name.fullmatch(name) and name != os.path.basename(cache_path):
+            os.remove(os.path.join(cache_dir, name))
+    return frame
+
+
+def load_rows_cached(file_path, label, cache_dir=CACHE_DIR):
+    """
+    CSV 하나를 읽어 라벨 + 날짜 파싱 + early_repay_flag 까지 붙인 대출 건 DataFrame.
+    """
+    key = cache_key(file_digest(file_path), label)
+    return cached_frame(
+        cache_dir, f'rows-{file_stem(file_path)}-{path_digest(file_path)}', key,
+        lambda: add_early_repay_flag(load_labeled_csv(file_path, label))
+    )
+
+
+def load_features_cached(kkun_file_path, non_kkun_file_path, cache_dir=CACHE_DIR):
+    """
+    꾼 / 꾼아님 CSV 쌍에 대한 userId별 feature_df.
+    피처 캐시가 없으면 파일별 rows 캐시에서 집계한다.
+    """
+    kkun_digest = file_digest(kkun_file_path)
+    non_kkun_digest = file_digest(non_kkun_file_path)
+    key = cache_key(kkun_digest, non_kkun_digest)
+    prefix = (f'features-{file_stem(kkun_file_path)}-{file_stem(non_kkun_file_path)}-'
+              f'{path_digest(kkun_file_path, non_kkun_file_path)}')
+
+    def build():
+        rows = pd.concat([
+            load_rows_cached(kkun_file_path, 1, cache_dir),
+            load_rows_cached(non_kkun_file_path, 0, cache_dir),
+        ], ignore_index=True)
+        return aggregate_features(rows)
+
+    return cached_frame(cache_dir, prefix, key, build)
@@ -0,0 +1,83 @@
+"""
+꾼 탐지 룰 비교 CLI.
+
+데이터 로드 + 피처 생성은 한 번만 하고, 선택한 룰들을 모두 적용해
+precision / recall 비교표를 출력한다.
+
+    python kkun_cli.py                                  # 등록된 전체 룰
+    python kkun_cli.py --rules o1-8 'o1-8-4/*'          # 이름 / glob 패턴
+    python kkun_cli.py --non-kkun gpt-playground/꾼아님_282제외.csv
+    python kkun_cli.py --list
+
+피처는 기본으로 .kkun_cache/ 에 Parquet 으로 캐시된다 (kkun_cache 참고).
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from kkun_cache import CACHE_DIR, load_features_cached
+from kkun_rules import RULES, evaluate_rules, feature_engineering, load_and_label_data
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='꾼 탐지 룰 precision/recall 비교')
+    parser.add_argument('--kkun', default='꾼.csv', help='꾼(1) 데이터 CSV')
+    parser.add_argument('--non-kkun', default='꾼아님.csv', help='꾼 아님(0) 데이터 CSV')
+    parser.add_argument('--rules', nargs='*', default=None,
+                        help="적용할 룰 이름 또는 glob 패턴 (기본: 전체)")
+    parser.add_argument('--sort-by', default=None,
+                        choices=['precision', 'recall', 'f1', 'rule_name'],
+                        help='결과 정렬 기준 (기본: 등록 순서)')
+    parser.add_argument('--min-precision', type=float, default=0.8)
+    parser.add_argument('--min-recall', type=float, default=0.8)
+    parser.add_argument('--output', default=None, help='비교표를 저장할 CSV 경로')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='피처 캐시 디렉터리')
+    parser.add_argument('--no-cache', action='store_true', help='캐시를 쓰지 않고 CSV 부터 다시 계산')
+    parser.add_argument('--list', action='store_true', help='등록된 룰 이름만 출력')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.list:
+        for name in RULES:
+            print(name)
+        return
+
+    start = time.perf_counter()
+    if args.no_cache:
+        feature_df = feature_engineering(load_and_label_data(args.kkun, args.non_kkun))
+    else:
+        feature_df = load_features_cached(args.kkun, args.non_kkun, args.cache_dir)
+    prepared = time.perf_counter()
+
+    summary = evaluate_rules(feature_df, args.rules)
+    evaluated = time.perf_counter()
+
+    if args.sort_by:
+        summary = summary.sort_values(args.sort_by, ascending=args.sort_by == 'rule_name')
+
+    print(f"=== {len(summary)}개 룰 결과 (users={len(feature_df)}, "
+          f"꾼={int(feature_df['is_kkun'].sum())}) ===")
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(summary.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    good_ones = summary[(summary['precision'] >= args.min_precision) &
+                        (summary['recall'] >= args.min_recall)]
+    if len(good_ones):
+        print(f">>> precision>={args.min_precision}, recall>={args.min_recall} 달성 룰:")
+        for name in good_ones['rule_name']:
+            print(f"    - {name}")
+    else:
+        print(f">>> precision>={args.min_precision}, recall>={args.min_recall} 를 동시에 만족하는 룰이 없습니다.")
+
+    print(f"(로드+피처 {prepared - start:.2f}s, 룰 평가 {evaluated - prepared:.2f}s)")
+
+    if args.output:
+        summary.to_csv(args.output, index=False, encoding='utf-8-sig')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,727 @@
+"""
+의도적 조기상환 꾼 탐지 룰 라이브러리.
+
+o1-1.py ~ o1-16.py, o1-8-1.py ~ o1-8-5.py 에 복사되어 있던
+로딩 / 날짜 파싱 / 피처 생성 코드를 한 곳으로 모으고,
+각 스크립트의 룰을 이름으로 등록해 둔다.
+
+    df = load_and_label_data('꾼.csv', '꾼아님.csv')
+    feature_df = feature_engineering(df)
+    summary = evaluate_rules(feature_df, ['o1-8', 'o1-8-1/*'])
+
+룰은 모두 feature_df 하나만 받아 0/1 배열을 반환하는 함수이므로,
+한 번 만든 feature_df 로 여러 룰을 한 프로세스에서 비교할 수 있다.
+"""
+import fnmatch
+import itertools
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+# parse_date 가 시도하던 날짜 포맷 (순서 그대로 우선순위)
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']
+
+DATE_COLUMNS = ['openedAt', 'dueAt', 'lastRepaymentAt']
+
+# 날짜 파싱 / 조기상환 판정 / 피처 집계 로직을 바꾸면 올린다 (kkun_cache 무효화용)
+FEATURE_VERSION = 2
+
+
+# ---------------------------------------------------------------------------
+# 로딩 / 피처 생성
+# ---------------------------------------------------------------------------
+
+def parse_dates(series):
+    """
+    날짜 문자열 Series 를 datetime64 Series 로 한 번에 변환.
+    - DATE_FORMATS 를 순서대로 시도하고, 앞선 포맷으로 파싱된 값이 우선
+    - 공백/빈 값/파싱 실패는 NaT
+    """
+    values = series.astype('string')
+    parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        remaining = parsed.isna() & values.notna() & (values != '')
+        if not remaining.any():
+            break
+        parsed[remaining] = pd.to_datetime(values[remaining], format=fmt, errors='coerce')
+    return parsed
+
+
+def load_labeled_csv(file_path, label):
+    """CSV 하나를 읽어 is_kkun 라벨을 붙인다."""
+    df = pd.read_csv(file_path)
+    df['is_kkun'] = label
+    return df
+
+
+def load_and_label_data(kkun_file_path, non_kkun_file_path):
+    """
+    의도적 조기상환 꾼(1) 데이터와, 꾼이 아닌(0) 데이터 불러와서 라벨링.
+    """
+    df_kkun = load_labeled_csv(kkun_file_path, 1)
+    df_non_kkun = load_labeled_csv(non_kkun_file_path, 0)
+    return pd.concat([df_kkun, df_non_kkun], ignore_index=True)
+
+
+def add_early_repay_flag(df):
+    """
+    대출 건별 조기상환 플래그(early_repay_flag)를 붙인다.
+    - status == 'performing' 이고 세 날짜가 모두 있는 건만 대상
+    - (lastRepaymentAt - openedAt) < (dueAt - openedAt) * 0.5 이면 조기상환
+    """
+    for col in DATE_COLUMNS:
+        df[col + '_dt'] = parse_dates(df[col])
+
+    total_term = (df['dueAt_dt'] - df['openedAt_dt']).dt.days
+    actual_term = (df['lastRepaymentAt_dt'] - df['openedAt_dt']).dt.days
+
+    early = (
+        (df['status'] == 'performing') &
+        (total_term > 0) &
+        (actual_term >= 0) &
+        (actual_term < 0.5 * total_term)
+    )
+    df['early_repay_flag'] = early.fillna(False).astype(int)
+    return df
+
+
+def feature_engineering(df):
+    """
+    원본 대출 건 DataFrame -> userId별 feature_df
+    (add_early_repay_flag + aggregate_features)
+    """
+    return aggregate_features(add_early_repay_flag(df))
+
+
+def aggregate_features(df):
+    """
+    early_repay_flag 가 붙은 대출 건에서 userId별로 아래 Feature들을 생성:
+     - early_repay_count
+     - avg_early_loan_amt  (조기상환 건의 평균 대출금액, 없으면 0)
+     - max_lost_loan_amt   (lost 건 중 최대 대출금액, lost 가 없으면 0)
+     - total_loan_count
+     - lost_count
+     - max_loan_amt        (전체 대출 중 최대 대출금액, '가장 큰 대출이 부실' 조건용)
+     - 연속 대출 피처      (aggregate_sequence_features 참고)
+     - is_kkun             (입력에 라벨이 있을 때만)
+    """
+    is_lost = df['status'] == 'lost'
+    work = pd.DataFrame({
+        'userId': df['userId'],
+        'early_repay_flag': df['early_repay_flag'],
+        'early_loan_amt': df['loanAmount'].where(df['early_repay_flag'] == 1),
+        'lost_flag': is_lost.astype(int),
+        'lost_loan_amt': df['loanAmount'].where(is_lost),
+        'loanAmount': df['loanAmount'],
+    })
+
+    grouping = work.groupby('userId')
+    feature_df = pd.DataFrame({
+        'early_repay_count': grouping['early_repay_flag'].sum(),
+        'avg_early_loan_amt': grouping['early_loan_amt'].mean().fillna(0),
+        'max_lost_loan_amt': grouping['lost_loan_amt'].max(),
+        'total_loan_count': grouping.size(),
+        'lost_count': grouping['lost_flag'].sum(),
+        'max_loan_amt': grouping['loanAmount'].max(),
+    })
+    # lost 건이 아예 없으면 0, lost 건은 있는데 금액이 비어 있으면 NaN 그대로 둔다
+    no_lost = feature_df['lost_count'] == 0
+    feature_df.loc[no_lost, 'max_lost_loan_amt'] = 0
+
+    feature_df = feature_df.join(aggregate_sequence_features(df))
+
+    if 'is_kkun' in df.columns:
+        feature_df['is_kkun'] = df.groupby('userId')['is_kkun'].first()
+
+    return feature_df.reset_index()
+
+
+# ---------------------------------------------------------------------------
+# 룰 정의
+# ---------------------------------------------------------------------------
+
+def early_ratio(feature_df):
+    """조기상환 비율 (total_loan_count 가 0 이면 1로 나눈다)"""
+    return feature_df['early_repay_count'] / np.where(
+        feature_df['total_loan_count'] > 0,
+        feature_df['total_loan_count'],
+        1
+    )
+
+
+def largest_loan_is_lost(feature_df):
+    """'부실 대출 중 최대 금액 == 전체 대출 중 최대 금액' 여부"""
+    return feature_df['max_lost_loan_amt'] == feature_df['max_loan_amt']
+
+
+def apply_rules(feature_df,
+                min_early_count=3,
+                min_early_ratio=None,
+                min_lost_count=1,
+                lost_amt_factor=2.0):
+    """
+    모든 조건을 AND 로 만족하면 꾼(1) (o1-1, o1-2, o1-3, o1-5 방식):
+      1) early_repay_count >= min_early_count
+      2) early_ratio >= min_early_ratio  (None 이면 생략)
+      3) lost_count >= min_lost_count
+      4) max_lost_loan_amt >= avg_early_loan_amt * lost_amt_factor
+    """
+    conditions = (
+        (feature_df['early_repay_count'] >= min_early_count) &
+        (feature_df['lost_count'] >= min_lost_count) &
+        (feature_df['max_lost_loan_amt'] >= feature_df['avg_early_loan_amt'] * lost_amt_factor)
+    )
+    if min_early_ratio is not None:
+        conditions = conditions & (early_ratio(feature_df) >= min_early_ratio)
+    return np.where(conditions, 1, 0)
+
+
+def apply_rules_score(feature_df,
+                      min_early_count=3,
+                      min_early_ratio=0.3,
+                      min_lost_count=1,
+                      lost_amt_factor=2.0,
+                      weight_early_count=1,
+                      weight_early_ratio=1,
+                      weight_lost_count=1,
+                      weight_lost_factor=1,
+                      weight_largest_lost=0,
+                      threshold=3,
+                      must_min_lost_count=None,
+                      must_largest_lost=False):
+    """
+    조건별 점수를 더해 threshold 이상이면 꾼(1) (o1-4 ~ o1-16 방식).
+
+    점수 항목:
+      (a) early_repay_count >= min_early_count              --> +weight_early_count
+      (b) early_ratio >= min_early_ratio                    --> +weight_early_ratio
+      (c) lost_count >= min_lost_count                      --> +weight_lost_count
+      (d) max_lost_loan_amt >= avg_early_loan_amt * factor  --> +weight_lost_factor
+      (e) 가장 큰 대출이 부실                                --> +weight_largest_lost
+    필수조건 (점수와 별개로 AND):
+      - must_min_lost_count : lost_count >= 값 (None 이면 생략)
+      - must_largest_lost   : 가장 큰 대출이 부실
+    """
+    score = np.zeros(len(feature_df))
+    score += (feature_df['early_repay_count'] >= min_early_count).astype(int) * weight_early_count
+    score += (early_ratio(feature_df) >= min_early_ratio).astype(int) * weight_early_ratio
+    score += (feature_df['lost_count'] >= min_lost_count).astype(int) * weight_lost_count
+    score += (feature_df['max_lost_loan_amt'] >= feature_df['avg_early_loan_amt'] * lost_amt_factor).astype(int) * weight_lost_factor
+
+    largest_lost = largest_loan_is_lost(feature_df)
+    if weight_largest_lost:
+        score += largest_lost.astype(int) * weight_largest_lost
+
+    must_cond = np.ones(len(feature_df), dtype=bool)
+    if must_min_lost_count is not None:
+        must_cond &= (feature_df['lost_count'] >= must_min_lost_count).values
+    if must_largest_lost:
+        must_cond &= largest_lost.values
+
+    return np.where(must_cond & (score >= threshold), 1, 0)
+
+
+def must_lost_condition(feature_df, must_cond_lost):
+    """o1-8-x 의 must_cond_lost: lost_count>=1 & max_lost_loan_amt>0"""
+    if not must_cond_lost:
+        return np.ones(len(feature_df), dtype=bool)
+    return ((feature_df['lost_count'] >= 1) & (feature_df['max_lost_loan_amt'] > 0)).values
+
+
+def apply_rules_variation(feature_df,
+                          min_early_count=3,
+                          min_early_ratio=0.3,
+                          min_lost_count=2,
+                          lost_amt_factor=2.5,
+                          threshold=3,
+                          must_cond_lost=False):
+    """
+    '점수 + 필수조건' 방식 (o1-8-1 ~ o1-8-3).
+      (1) early_repay_count >= min_early_count --> +1
+      (2) early_ratio >= min_early_ratio --> +1
+      (3) lost_count >= min_lost_count --> +1
+      (4) max_lost_loan_amt >= avg_early_loan_amt * lost_amt_factor --> +1
+    must_cond_lost 이면 lost_count>=1 & max_lost_loan_amt>0 을 필수로 둔다.
+    """
+    score = np.zeros(len(feature_df))
+    score += (feature_df['early_repay_count'] >= min_early_count).astype(int)
+    score += (early_ratio(feature_df) >= min_early_ratio).astype(int)
+    score += (feature_df['lost_count'] >= min_lost_count).astype(int)
+    score += (feature_df['max_lost_loan_amt'] >= feature_df['avg_early_loan_amt'] * lost_amt_factor).astype(int)
+
+    must_condition = must_lost_condition(feature_df, must_cond_lost)
+    return np.where(must_condition & (score >= threshold), 1, 0)
+
+
+def apply_rules_weighted(feature_df,
+                         weight_early_count5=1,
+                         weight_early_count6=1,
+                         weight_ratio05=1,
+                         weight_ratio06=1,
+                         weight_lost1=1,
+                         weight_lost2=1,
+                         weight_factor20=1,
+                         weight_factor25=1,
+                         threshold=3,
+                         must_cond_lost=False):
+    """
+    가중치 기반 누적 점수 (o1-8-4, o1-8-5):
+       - 조기상환 횟수>=5 -> +weight_early_count5, >=6 -> +weight_early_count6 (누적)
+       - 조기상환 비율>=0.5 -> +weight_ratio05, >=0.6 -> +weight_ratio06
+       - lost_count>=1 -> +weight_lost1, >=2 -> +weight_lost2
+       - 부실금액/조기상환평균 배수>=2.0 -> +weight_factor20, >=2.5 -> +weight_factor25
+    """
+    ratio = early_ratio(feature_df)
+    lost_factor = np.where(feature_df['avg_early_loan_amt'] > 0,
+                           feature_df['max_lost_loan_amt'] / feature_df['avg_early_loan_amt'],
+                           0)
+
+    score = np.zeros(len(feature_df))
+    score += (feature_df['early_repay_count'] >= 5).astype(int) * weight_early_count5
+    score += (feature_df['early_repay_count'] >= 6).astype(int) * weight_early_count6
+    score += (ratio >= 0.5).astype(int) * weight_ratio05
+    score += (ratio >= 0.6).astype(int) * weight_ratio06
+    score += (feature_df['lost_count'] >= 1).astype(int) * weight_lost1
+    score += (feature_df['lost_count'] >= 2).astype(int) * weight_lost2
+    score += (lost_factor >= 2.0).astype(int) * weight_factor20
+    score += (lost_factor >= 2.5).astype(int) * weight_factor25
+
+    must_condition = must_lost_condition(feature_df, must_cond_lost)
+    return np.where(must_condition & (score >= threshold), 1, 0)
+
+
+# deepseek-1.py 는 '%m/%d/%Y' 하나만 파싱했다 (다른 포맷은 날짜 없음으로 취급)
+DEEPSEEK_DATE_FORMAT = '%m/%d/%Y'
+
+
+def deepseek_features(df, by='userId'):
+    """
+    deepseek-1.py classify_borrower 의 피처를 groupby 한 번으로 계산.
+      - loan_count  : 대출 건수
+      - early_ratio : lastRepaymentAt < dueAt 인 건의 비율
+      - over_ratio  : repaymentAmount > loanAmount 인 건의 비율
+      - has_lost    : lost 건 존재 여부
+    by 에 ['is_kkun', 'userId'] 처럼 라벨을 같이 주면 여러 파일을 한 번에 처리해도
+    파일별로 따로 돌린 것과 같은 결과가 나온다.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+
+    due = pd.to_datetime(df['dueAt'], format=DEEPSEEK_DATE_FORMAT, errors='coerce')
+    last_repay = pd.to_datetime(df['lastRepaymentAt'], format=DEEPSEEK_DATE_FORMAT, errors='coerce')
+    loan_amt = pd.to_numeric(df['loanAmount'], errors='coerce')
+    # 숫자가 아니거나 빈 금액은 NaN -> 비교 결과 False (원본의 try/except 와 동일)
+    repay_amt = pd.to_numeric(df['repaymentAmount'], errors='coerce')
+
+    work = df[by].copy()
+    work['early'] = (last_repay < due).astype(int)
+    work['over'] = (repay_amt > loan_amt).astype(int)
+    work['lost'] = df['status'] == 'lost'
+
+    grouping = work.groupby(by)
+    loan_count = grouping.size()
+    feature_df = pd.DataFrame({
+        'loan_count': loan_count,
+        'early_ratio': grouping['early'].sum() / loan_count,
+        'over_ratio': grouping['over'].sum() / loan_count,
+        'has_lost': grouping['lost'].any(),
+    })
+    return feature_df.reset_index()
+
+
+def apply_rules_deepseek(feature_df,
+                         min_loan_count=5,
+                         min_early_ratio=0.7,
+                         min_over_ratio=0.3):
+    """
+    deepseek-1.py 분류 규칙 (정밀도 최적화):
+      loan_count >= 5 & early_ratio >= 0.7 & over_ratio >= 0.3 & has_lost
+    """
+    return (
+        (feature_df['loan_count'] >= min_loan_count) &
+        (feature_df['early_ratio'] >= min_early_ratio) &
+        (feature_df['over_ratio'] >= min_over_ratio) &
+        (feature_df['has_lost'])
+    )
+
+
+def classify_borrower(df, by='userId'):
+    """deepseek_features + apply_rules_deepseek -> 'prediction' 컬럼"""
+    feature_df = deepseek_features(df, by)
+    feature_df['prediction'] = apply_rules_deepseek(feature_df)
+    return feature_df
+
+
+# ---------------------------------------------------------------------------
+# 연속 대출(sequential lending) 피처 - 의도적_상환_꾼.ipynb 의 window 쿼리
+# ---------------------------------------------------------------------------
+
+# cheater_flag 쿼리 버전
+#   v1: 세 조건 AND, 상환 2일 이내도 조기상환
+#   v2: (연속성 추가) 상환 3일 이내
+#   v3: (streak 빼고) next_status == 'lost' 이면 단독으로 플래그
+SEQUENCE_VARIANTS = {
+    'v1': {'early_days': 2, 'next_lost_alone': False},
+    'v2': {'early_days': 3, 'next_lost_alone': False},
+    'v3': {'early_days': 3, 'next_lost_alone': True},
+}
+
+# days_until_next_loan <= 3 이면 '바로 다음 대출'
+NEXT_LOAN_MAX_DAYS = 3
+
+SEQUENCE_PARTITION_COLUMNS = ['institutionName', 'identifiedInstitution']
+
+
+def interval_days(delta):
+    """DATE_PART('day', ts1 - ts2) 와 같이 일 단위를 0 방향으로 자른다 (.dt.days 는 내림)"""
+    return np.trunc(delta.dt.total_seconds() / 86400)
+
+
+def sequence_partition_column(df):
+    """PARTITION BY 에 쓸 기관 컬럼 (credit_history 는 institutionName, 라벨 CSV 는 identifiedInstitution)"""
+    for col in SEQUENCE_PARTITION_COLUMNS:
+        if col in df.columns:
+            return col
+    return None
+
+
+def sequence_cheater_flag(seq, variant='v3'):
+    """
+    analyzed_loans.cheater_flag (NULL 비교는 False 로 취급 = CASE WHEN 과 동일)
+    """
+    params = SEQUENCE_VARIANTS[variant]
+    early = (
+        (seq['actual_repayment_period'] <= seq['total_loan_period'] * 0.5) |
+        (seq['actual_repayment_period'] <= params['early_days'])
+    )
+    next_lost = seq['next_status'] == 'lost'
+    quick_next = seq['days_until_next_loan'] <= NEXT_LOAN_MAX_DAYS
+    not_smaller = (seq['next_loan_amount'] >= seq['loanAmount']) | seq['next_loan_amount'].isna()
+
+    if params['next_lost_alone']:
+        flag = next_lost | (early & quick_next & not_smaller)
+    else:
+        flag = early & (next_lost | quick_next) & not_smaller
+    return flag.astype(int)
+
+
+def sequence_windows(df, partition_col=None):
+    """
+    PARTITION BY userId, 기관 ORDER BY openedAt 로 정렬한 뒤 window 컬럼을 계산한다.
+      - next_opened_at / next_status / next_loan_amount : LEAD(...)
+      - total_loan_period / actual_repayment_period / days_until_next_loan
+      - loan_seq : 파티션 내 순번 (0부터, ROW_NUMBER() - 1)
+      - next_loan_escalation : 3일 안에 더 큰 금액으로 다음 대출
+    반환값은 정렬된 순서이며, 'row' 컬럼에 입력 df 의 행 위치를 담는다.
+    """
+    for col in DATE_COLUMNS:
+        if col + '_dt' not in df.columns:
+            df[col + '_dt'] = parse_dates(df[col])
+
+    partition_col = partition_col or sequence_partition_column(df)
+    keys = ['userId'] + ([partition_col] if partition_col else [])
+
+    seq = df[keys + ['openedAt_dt', 'dueAt_dt', 'lastRepaymentAt_dt', 'status', 'loanAmount']].reset_index(drop=True)
+    seq['row'] = np.arange(len(seq))
+    # ORDER BY openedAt (NULL 은 뒤로), 동률은 원래 순서
+    seq = seq.sort_values(keys + ['openedAt_dt'], kind='stable', na_position='last', ignore_index=True)
+    grouping = seq.groupby(keys, dropna=False, sort=False)
+
+    seq['next_opened_at'] = grouping['openedAt_dt'].shift(-1)
+    seq['next_status'] = grouping['status'].shift(-1)
+    seq['next_loan_amount'] = grouping['loanAmount'].shift(-1)
+    seq['loan_seq'] = grouping.cumcount()
+    seq['total_loan_period'] = interval_days(seq['dueAt_dt'] - seq['openedAt_dt'])
+    seq['actual_repayment_period'] = interval_days(seq['lastRepaymentAt_dt'] - seq['openedAt_dt'])
+    seq['days_until_next_loan'] = interval_days(seq['next_opened_at'] - seq['lastRepaymentAt_dt'])
+    seq['next_loan_escalation'] = (
+        (seq['next_loan_amount'] > seq['loanAmount']) &
+        (seq['days_until_next_loan'] <= NEXT_LOAN_MAX_DAYS)
+    ).astype(int)
+    return seq
+
+
+def sequence_streaks(seq, flag):
+    """
+    정렬된 seq 기준 플래그 배열 -> (cheater_streak, cheater_run)
+      - cheater_streak : 이번 건과 직전 건이 모두 플래그 (LAG 기반 streak 쿼리)
+      - cheater_run    : 이번 건에서 끝나는 연속 플래그 길이 (플래그 아니면 0)
+    """
+    flag = np.asarray(flag)
+    first_in_partition = (seq['loan_seq'] == 0).values
+
+    prev_flag = np.roll(flag, 1)
+    prev_flag[first_in_partition] = 0
+    streak = ((flag == 1) & (prev_flag == 1)).astype(int)
+
+    # run-length: 파티션 시작 또는 플래그 값이 바뀌는 지점마다 새 run
+    new_run = first_in_partition | (flag != np.roll(flag, 1))
+    run_id = np.cumsum(new_run)
+    run_pos = pd.Series(run_id).groupby(run_id).cumcount().values + 1
+    run = np.where(flag == 1, run_pos, 0)
+    return streak, run
+
+
+SEQUENCE_COLUMNS = [
+    'next_opened_at', 'next_status', 'next_loan_amount',
+    'total_loan_period', 'actual_repayment_period', 'days_until_next_loan',
+    'loan_seq', 'cheater_flag', 'cheater_streak', 'cheater_run', 'next_loan_escalation',
+]
+
+
+def add_sequence_features(df, variant='v3', partition_col=None):
+    """
+    의도적_상환_꾼.ipynb 쿼리 결과와 같은 대출 건별 컬럼(SEQUENCE_COLUMNS)을 붙인다.
+    정렬은 한 번, 나머지는 shift / cumsum 으로 계산한다. 행 순서는 입력 그대로.
+    """
+    seq = sequence_windows(df, partition_col)
+    seq['cheater_flag'] = sequence_cheater_flag(seq, variant)
+    seq['cheater_streak'], seq['cheater_run'] = sequence_streaks(seq, seq['cheater_flag'])
+
+    seq = seq.sort_values('row')
+    for col in SEQUENCE_COLUMNS:
+        df[col] = seq[col].values
+    return df
+
+
+def aggregate_sequence_features(df):
+    """
+    userId별 연속 대출 피처:
+      - cheater_count_v1 / v2 / v3 : 버전별 cheater_flag 건수
+      - cheater_streak_count       : v3 기준 연속 플래그(streak) 건수
+      - max_cheater_run            : v3 기준 가장 긴 연속 플래그 길이
+      - next_escalation_count      : 3일 안에 더 큰 금액으로 이어진 대출 건수
+    """
+    seq = sequence_windows(df)
+    work = pd.DataFrame({'userId': seq['userId']})
+    for variant in SEQUENCE_VARIANTS:
+        work[f'cheater_count_{variant}'] = sequence_cheater_flag(seq, variant)
+    work['cheater_streak'], work['cheater_run'] = sequence_streaks(seq, work['cheater_count_v3'])
+    work['next_loan_escalation'] = seq['next_loan_escalation']
+
+    grouping = work.groupby('userId')
+    result = grouping[[f'cheater_count_{variant}' for variant in SEQUENCE_VARIANTS]].sum()
+    result['cheater_streak_count'] = grouping['cheater_streak'].sum()
+    result['max_cheater_run'] = grouping['cheater_run'].max()
+    result['next_escalation_count'] = grouping['next_loan_escalation'].sum()
+    return result
+
+
+def apply_rules_sequence(feature_df,
+                         variant='v3',
+                         min_cheater_count=1,
+                         min_max_run=None,
+                         min_escalations=None):
+    """
+    연속 대출 룰:
+      - cheater_count_{variant} >= min_cheater_count
+      - max_cheater_run >= min_max_run          (None 이면 생략)
+      - next_escalation_count >= min_escalations (None 이면 생략)
+    """
+    conditions = feature_df[f'cheater_count_{variant}'] >= min_cheater_count
+    if min_max_run is not None:
+        conditions = conditions & (feature_df['max_cheater_run'] >= min_max_run)
+    if min_escalations is not None:
+        conditions = conditions & (feature_df['next_escalation_count'] >= min_escalations)
+    return np.where(conditions, 1, 0)
+
+
+# ---------------------------------------------------------------------------
+# 룰 등록
+# ---------------------------------------------------------------------------
+
+# 이름 -> feature_df 를 받아 0/1 배열을 반환하는 함수
+RULES = {}
+
+
+def register_rule(name, func, **params):
+    """룰 함수와 파라미터를 이름으로 등록한다."""
+    RULES[name] = partial(func, **params) if params else func
+    return RULES[name]
+
+
+# o1-1 ~ o1-16: 스크립트 파일명 그대로 등록
+register_rule('o1-1', apply_rules, min_early_count=3, lost_amt_factor=2, min_lost_count=1)
+register_rule('o1-2', apply_rules, min_early_count=4, min_early_ratio=0.5, min_lost_count=1, lost_amt_factor=3)
+register_rule('o1-3', apply_rules, min_early_count=4, min_early_ratio=0.2, min_lost_count=2, lost_amt_factor=3)
+register_rule('o1-4', apply_rules_score, min_early_count=3, min_early_ratio=0.15, min_lost_count=1,
+              lost_amt_factor=2, threshold=2)
+register_rule('o1-5', apply_rules, min_early_count=3, min_early_ratio=0.3, min_lost_count=1, lost_amt_factor=2)
+register_rule('o1-6', apply_rules_score, min_early_count=2, min_early_ratio=0.2, min_lost_count=1,
+              lost_amt_factor=2, threshold=2)
+register_rule('o1-7', apply_rules_score, min_early_count=2, min_early_ratio=0.2, lost_amt_factor=1.8,
+              weight_lost_count=0, weight_largest_lost=2, threshold=3, must_min_lost_count=1)
+register_rule('o1-8', apply_rules_score, min_early_count=3, min_early_ratio=0.3, min_lost_count=2,
+              lost_amt_factor=2.5, threshold=3)
+register_rule('o1-9', apply_rules_score, min_early_count=3, min_early_ratio=0.3, lost_amt_factor=2,
+              weight_lost_count=0, weight_largest_lost=1, threshold=3, must_min_lost_count=1)
+register_rule('o1-10', apply_rules_score, min_early_count=3, min_early_ratio=0.35, min_lost_count=3,
+              lost_amt_factor=3, weight_lost_count=2, threshold=4)
+register_rule('o1-11', apply_rules_score, min_early_count=4, min_early_ratio=0.4, lost_amt_factor=2.5,
+              weight_lost_count=0, weight_largest_lost=2, threshold=4, must_min_lost_count=1)
+register_rule('o1-12', apply_rules_score, min_early_count=4, min_early_ratio=0.4, min_lost_count=4,
+              lost_amt_factor=3.5, weight_lost_count=2, threshold=4)
+register_rule('o1-13', apply_rules_score, min_early_count=3, min_early_ratio=0.3, lost_amt_factor=2,
+              weight_lost_count=0, threshold=2, must_min_lost_count=1, must_largest_lost=True)
+# o1-14 는 'score == 5' 였지만 최대점이 5점이라 >= 5 와 같다
+register_rule('o1-14', apply_rules_score, min_early_count=4, min_early_ratio=0.45, min_lost_count=5,
+              lost_amt_factor=4.0, weight_lost_count=2, threshold=5)
+register_rule('o1-15', apply_rules_score, min_early_count=4, min_early_ratio=0.4, lost_amt_factor=2.5,
+              weight_lost_count=0, threshold=3, must_min_lost_count=2, must_largest_lost=True)
+register_rule('o1-16', apply_rules_score, min_early_count=3, min_early_ratio=0.3, lost_amt_factor=2.0,
+              weight_lost_count=0, threshold=3, must_min_lost_count=1, must_largest_lost=True)
+
+# o1-8-1 ~ o1-8-3: (min_early_count, min_early_ratio, min_lost_count, lost_amt_factor, threshold, must_cond_lost)
+VARIATION_RULES = {
+    'o1-8-1': {
+        'rule1': (3, 0.3, 2, 2.5, 3, False),
+        'rule2': (3, 0.3, 1, 2.5, 3, True),
+        'rule3': (4, 0.4, 1, 2.0, 3, False),
+        'rule4': (2, 0.2, 1, 2.0, 2, False),
+        'rule5': (3, 0.3, 2, 2.5, 4, True),
+        'rule6': (5, 0.5, 1, 2.0, 3, False),
+        'rule7': (2, 0.2, 2, 1.8, 3, False),
+        'rule8': (3, 0.3, 1, 3.0, 3, True),
+        'rule9': (4, 0.3, 2, 2.0, 4, False),
+        'rule10': (4, 0.4, 2, 2.5, 4, True),
+    },
+    'o1-8-2': {
+        'ruleA': (5, 0.5, 1, 2.0, 3, False),
+        'ruleB': (6, 0.5, 1, 2.0, 3, False),
+        'ruleC': (5, 0.6, 1, 2.0, 3, False),
+        'ruleD': (5, 0.5, 1, 2.5, 3, False),
+        'ruleE': (5, 0.5, 2, 2.0, 3, False),
+        'ruleF': (5, 0.5, 1, 2.0, 4, False),
+        'ruleG': (5, 0.5, 1, 2.0, 3, True),
+        'ruleH': (5, 0.5, 1, 2.0, 4, True),
+        'ruleI': (5, 0.5, 2, 2.5, 3, False),
+        'ruleJ': (6, 0.5, 1, 2.5, 4, False),
+    },
+    'o1-8-3': {
+        'rule1': (5, 0.45, 1, 2.0, 3, False),
+        'rule2': (5, 0.5, 2, 2.2, 3, False),
+        'rule3': (5, 0.6, 1, 2.2, 3, False),
+        'rule4': (5, 0.5, 1, 2.5, 3, True),
+        'rule5': (5, 0.4, 2, 2.0, 3, False),
+        'rule6': (5, 0.5, 1, 2.0, 2, False),
+        'rule7': (5, 0.5, 1, 2.0, 4, False),
+        'rule8': (5, 0.55, 2, 2.3, 3, False),
+        'rule9': (6, 0.5, 1, 2.3, 3, False),
+        'rule10': (5, 0.5, 2, 2.5, 4, True),
+    },
+}
+
+for script, rules in VARIATION_RULES.items():
+    for rule_name, (cnt, ratio, lost, factor, thr, must) in rules.items():
+        register_rule(f'{script}/{rule_name}', apply_rules_variation,
+                      min_early_count=cnt, min_early_ratio=ratio, min_lost_count=lost,
+                      lost_amt_factor=factor, threshold=thr, must_cond_lost=must)
+
+# o1-8-4: (w_cnt5, w_cnt6, w_r05, w_r06, w_l1, w_l2, w_f20, w_f25, threshold, must_cond_lost)
+WEIGHTED_RULES = {
+    'ruleW1': (1, 2, 1, 1, 1, 1, 1, 1, 4, False),
+    'ruleW2': (1, 1, 1, 1, 1, 2, 1, 2, 3, False),
+    'ruleW3': (1, 1, 1, 1, 1, 1, 1, 2, 3, True),
+    'ruleW4': (1, 2, 2, 2, 1, 1, 1, 1, 5, False),
+    'ruleW5': (1, 1, 1, 2, 2, 3, 1, 1, 5, False),
+    'ruleW6': (1, 1, 1, 1, 1, 1, 2, 3, 4, False),
+    'ruleW7': (1, 2, 1, 1, 1, 2, 1, 2, 4, True),
+    'ruleW8': (2, 3, 2, 3, 1, 1, 1, 2, 3, False),
+    'ruleW9': (1, 1, 1, 1, 1, 2, 2, 2, 4, False),
+    'ruleW10': (2, 3, 1, 2, 1, 1, 2, 3, 4, True),
+}
+
+# o1-8-5: 아래 그리드를 순서대로 돌며 앞의 30개만 사용
+WEIGHTED_GRID = [
+    [1, 2],           # weight_early_count5
+    [1, 2, 3],        # weight_early_count6
+    [1, 2],           # weight_ratio05
+    [1, 2, 3],        # weight_ratio06
+    [1, 2],           # weight_lost1
+    [2, 3],           # weight_lost2
+    [1, 2],           # weight_factor20
+    [2, 3],           # weight_factor25
+    [3, 4],           # threshold
+    [False, True],    # must_cond_lost
+]
+WEIGHTED_GRID_SIZE = 30
+
+
+def register_weighted(name, values):
+    (wec5, wec6, wr05, wr06, wl1, wl2, wf20, wf25, thr, must) = values
+    register_rule(name, apply_rules_weighted,
+                  weight_early_count5=wec5, weight_early_count6=wec6,
+                  weight_ratio05=wr05, weight_ratio06=wr06,
+                  weight_lost1=wl1, weight_lost2=wl2,
+                  weight_factor20=wf20, weight_factor25=wf25,
+                  threshold=thr, must_cond_lost=must)
+
+
+for rule_name, values in WEIGHTED_RULES.items():
+    register_weighted(f'o1-8-4/{rule_name}', values)
+
+for idx, values in enumerate(itertools.islice(itertools.product(*WEIGHTED_GRID), WEIGHTED_GRID_SIZE)):
+    register_weighted(f'o1-8-5/rule_{idx + 1}', values)
+
+# 의도적_상환_꾼.ipynb 쿼리: 플래그된 대출이 한 건이라도 있으면 꾼
+for variant in SEQUENCE_VARIANTS:
+    register_rule(f'seq-{variant}', apply_rules_sequence, variant=variant)
+register_rule('seq-v3/streak', apply_rules_sequence, variant='v3', min_max_run=2)
+register_rule('seq-v3/escalation', apply_rules_sequence, variant='v3', min_escalations=1)
+
+
+# ---------------------------------------------------------------------------
+# 평가
+# ---------------------------------------------------------------------------
+
+def select_rules(patterns=None):
+    """
+    이름 또는 glob 패턴('o1-8-*/*' 등)으로 룰을 고른다.
+    패턴이 없으면 등록된 전체 룰을 등록 순서대로 반환.
+    """
+    if not patterns:
+        return list(RULES)
+
+    selected = []
+    for pattern in patterns:
+        matched = [name for name in RULES if fnmatch.fnmatchcase(name, pattern)]
+        if not matched:
+            raise KeyError(f"등록되지 않은 룰: {pattern}")
+        selected.extend(name for name in matched if name not in selected)
+    return selected
+
+
+def precision_recall(y_true, y_pred):
+    """꾼(1) 기준 precision / recall (예측 1이 없으면 precision 0)"""
+    y_true = np.asarray(y_true) == 1
+    y_pred = np.asarray(y_pred) == 1
+    tp = int(np.sum(y_true & y_pred))
+    fp = int(np.sum(~y_true & y_pred))
+    fn = int(np.sum(y_true & ~y_pred))
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+    return precision, recall, tp, fp, fn
+
+
+def evaluate_rules(feature_df, rule_names=None):
+    """
+    선택된 룰들을 같은 feature_df 에 적용해 비교표(DataFrame)를 만든다.
+    컬럼: rule_name, precision, recall, f1, tp, fp, fn, predicted
+    """
+    y_true = feature_df['is_kkun'].values
+    rows = []
+    for name in select_rules(rule_names):
+        y_pred = RULES[name](feature_df)
+        precision, recall, tp, fp, fn = precision_recall(y_true, y_pred)
+        f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
+        rows.append({
+            'rule_name': name,
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+            'tp': tp,
+            'fp': fp,
+            'fn': fn,
+            'predicted': int(np.sum(y_pred)),
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,120 @@
+"""
+credit_history 전체 유저 스트리밍 꾼 스코어러.
+
+userId 순으로 정렬된 대출 건을 청크 단위로 읽고, 청크 마지막 유저의 행만
+다음 청크로 넘긴다. 나머지 유저는 바로 피처 생성 + 룰 적용 후 내보내므로
+메모리는 테이블 크기와 무관하게 (청크 크기 + 가장 큰 유저 1명) 로 유지된다.
+
+입력 소스:
+  - iter_csv_chunks   : "order by userId" 로 뽑은 CSV
+  - iter_query_chunks : psycopg2 named(server-side) cursor
+
+    python kkun_stream.py --input credit_history.csv --output kkun_scores.csv --rules o1-8 o1-16
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from kkun_rules import RULES, feature_engineering, select_rules
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def iter_csv_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """userId 순으로 정렬된 CSV 를 chunksize 행씩 읽는다."""
+    yield from pd.read_csv(file_path, chunksize=chunksize)
+
+
+def iter_query_chunks(conn, query, params=None, chunksize=DEFAULT_CHUNKSIZE, cursor_name='kkun_stream'):
+    """
+    named cursor(서버 사이드 커서)로 쿼리 결과를 chunksize 행씩 DataFrame 으로 읽는다.
+    query 는 반드시 ORDER BY "userId" 를 포함해야 한다.
+    """
+    with conn.cursor(name=cursor_name) as cursor:
+        cursor.itersize = chunksize
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+
+
+def iter_user_batches(chunks):
+    """
+    청크 스트림 -> '완결된 유저들'의 행 묶음 스트림.
+    각 청크의 마지막 userId 는 다음 청크에 이어질 수 있으므로 carry 로 넘긴다.
+    userId 가 (carry 를 붙인) 청크 안에서 오름차순이 아니거나, 이미 내보낸 유저가
+    다시 나오면 ValueError (같은 유저가 일부 행으로 두 번 스코어링되는 것을 막음).
+    """
+    carry = None
+    last_emitted = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+
+        user_ids = chunk['userId']
+        if not user_ids.is_monotonic_increasing or (last_emitted is not None and user_ids.iloc[0] <= last_emitted):
+            raise ValueError(f"입력이 userId 순으로 정렬되어 있지 않습니다 (마지막으로 내보낸 userId: {last_emitted})")
+
+        last_user = user_ids.iloc[-1]
+        is_last_user = (user_ids == last_user).values
+        carry = chunk[is_last_user]
+        complete = chunk[~is_last_user]
+        if complete.empty:
+            continue
+
+        last_emitted = complete['userId'].iloc[-1]
+        yield complete
+
+    if carry is not None and not carry.empty:
+        yield carry
+
+
+def score_users(rows, rule_names):
+    """대출 건 -> userId별 피처 + 룰별 예측(0/1) 컬럼"""
+    feature_df = feature_engineering(rows.copy())
+    for name in rule_names:
+        feature_df[name] = RULES[name](feature_df)
+    return feature_df
+
+
+def score_stream(chunks, rule_names=None):
+    """청크 스트림을 받아 유저 묶음별 스코어 DataFrame 을 yield"""
+    rule_names = select_rules(rule_names)
+    for rows in iter_user_batches(chunks):
+        yield score_users(rows, rule_names)
+
+
+def write_scores(scored_batches, output_path):
+    """스코어 묶음을 CSV 하나로 이어 쓴다. 처리한 유저 수를 반환."""
+    n_users = 0
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        for i, batch in enumerate(scored_batches):
+            batch.to_csv(f, index=False, header=(i == 0))
+            n_users += len(batch)
+    return n_users
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='credit_history 전체 유저 꾼 룰 스트리밍 스코어링')
+    parser.add_argument('--input', required=True, help='userId 순으로 정렬된 credit_history CSV')
+    parser.add_argument('--output', default='kkun_scores.csv')
+    parser.add_argument('--rules', nargs='*', default=['o1-8'], help='적용할 룰 이름 또는 glob 패턴')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    batches = score_stream(iter_csv_chunks(args.input, args.chunksize), args.rules)
+    n_users = write_scores(batches, args.output)
+    print(f"{n_users}명 스코어링 완료 -> {args.output} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+credit_history 기간별 / 기관별 대출 및 부실 현황.
+
+월별 부실률 조회.ipynb 는 월마다 (120번), 연도별, 기관별 부실률 조회.ipynb 는
+기관 x 연도마다 쿼리를 한 번씩 보낸다. 여기서는
+(개설 월 x institutionName x identifiedInstitution x bureau) 단위 큐브를
+GROUP BY date_trunc('month', ...) 쿼리 한 번으로 받고, 월 / 반기 / 연도 / 기관별
+리포트는 모두 이 큐브를 로컬에서 다시 묶어 만든다.
+
+    cube = fetch_loss_cube(conn)
+    rollup(cube, 'year', by=['bureau'])          # 연도 x bureau 부실률
+    write_reports(cube, '.')                      # 노트북들이 만들던 CSV 4개를 한 번에
+
+refresh_loss_cube 는 큐브를 Parquet 파일로 저장해 두고, 지난 실행 이후
+"reportedAt" 이 새로 들어온 행이 있는 개설 월만 다시 집계해 갈아 끼운다.
+리포트는 credit_history 를 다시 읽지 않고 저장된 큐브만 묶는다.
+"reportedAt" 을 움직이지 않는 변경 (행 삭제, reportedAt 그대로인 status 변경,
+watermark 보다 과거 reportedAt 으로 뒤늦게 들어온 행) 은 --full 로 다시 만들어야 반영된다.
+
+    cube = refresh_loss_cube(conn, now, 'loss_cube.parquet')
+
+    python loss_rates.py --output-dir . --start-year 2015 --end-year 2024
+    python loss_rates.py --cube loss_cube.parquet          # 저장된 큐브를 증분 갱신해서 사용
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from rule_mart import fetch_frame
+
+# 노트북들의 조회 기간 (2015 ~ 2024년)
+START_YEAR = 2015
+END_YEAR = 2024
+
+# 큐브 차원 (개설 월 외)
+CUBE_DIMENSIONS = ['institutionName', 'identifiedInstitution', 'bureau']
+CUBE_MEASURES = ['total_count', 'lost_count', 'loan_amount', 'lost_amount']
+
+# 개설 월 x 기관 x bureau 별 대출 / 부실 건수, 금액.
+# total_count 는 노트북과 같이 COUNT("createdAt"), lost_count 는 status = 'lost' 건수.
+# reported_watermark 는 그 그룹의 max "reportedAt" (증분 갱신 기준).
+# NULL 차원도 GROUP BY 에서 한 그룹으로 남는다.
+LOSS_CUBE_QUERY = '''
+    SELECT
+        date_trunc('month', ch."openedAt")::date AS "month",
+        ch."institutionName",
+        ch."identifiedInstitution",
+        ch."bureau",
+        COUNT(ch."createdAt") AS "total_count",
+        COUNT(*) FILTER (WHERE ch."status" = 'lost') AS "lost_count",
+        COALESCE(SUM(ch."loanAmount"), 0)::float8 AS "loan_amount",
+        COALESCE(SUM(ch."loanAmount") FILTER (WHERE ch."status" = 'lost'), 0)::float8 AS "lost_amount",
+        MAX(ch."reportedAt") AS "reported_watermark"
+    FROM credit_history ch
+    WHERE ch."openedAt" >= %(start)s
+        AND ch."openedAt" < %(end)s
+    GROUP BY 1, 2, 3, 4
+'''
+
+# 연도별, 기관별 부실률 조회.ipynb 의 기관 목록
+RATE_INSTITUTIONS = [
+    "NewEdge Finance", "MYCREDIT INVESTMENTS LIMITED", "Carbon Microfinance Bank Limited",
+    "Aella Financial Solution Ltd", "MyCredit Invest", "BLUERIDGE MICROFINANCE BANK LIMITED",
+    "Access Bank Plc Lagos", "Arve Limited", "Guaranty Trust Bank Plc",
+    "Fairmoney Microfinance Bank Limited", "Credit Direct Ltd Lagos",
+    "RenMoney MFB Nigeria Limited  Lagos", "Zedvance Limited Lagos",
+    "ALTRACRED FINANCE INVESTMENT LIMITED", "MyCredit Investments Limited",
+    "NewEdge Finance Limited", "AELLA FINANCIAL SOLUTIONS LIMITED",
+    "CashXpress Nigeria Limited", "BetterLending Company Limited",
+    "MIM Finance Company Limited", "CARBON FINANCE AND INVESTMENT LIMITED",
+    "BRANCH INTERNATIONAL FINANCIAL SERVICE LIMITED", "Access Bank Plc",
+    "Branch International Financial Services Limited", "RENMONEY MICROFINANCE BANK LIMITED",
+    "FAIRMONEY MICROFINANCE BANK LIMITED", "First City Monument Bank Ltd Lagos",
+    "Zedvance Limited", "Polaris Bank Limited Lagos", "Crednet Technologies Limited (CredPal)",
+]
+
+# 연도별, 기관별 대출 및 부실 건수 조회.ipynb 의 기관 목록
+COUNT_INSTITUTIONS = [
+    "First City Monument Bank Ltd Lagos", "Polaris Bank Limited Lagos", "Arve Limited",
+    "Access Bank Plc Lagos", "Guaranty Trust Bank Plc", "BetterLending Company Limited",
+    "Credit Direct Ltd Lagos", "Zedvance Limited Lagos", "NewEdge Finance",
+    "MIM Finance Company Limited", "MYCREDIT INVESTMENTS LIMITED",
+    "Fairmoney Microfinance Bank Limited", "Carbon Microfinance Bank Limited",
+    "Aella Financial Solution Ltd", "ALTRACRED FINANCE INVESTMENT LIMITED",
+    "CashXpress Nigeria Limited", "RenMoney MFB Nigeria Limited Lagos",
+    "BLUERIDGE MICROFINANCE BANK LIMITED", "BRANCH INTERNATIONAL FINANCIAL SERVICE LIMITED",
+]
+
+# write_reports 가 쓰는 파일
+MONTHLY_CSV = '월별_대출현황.csv'
+HALF_YEAR_CSV = '반기별_대출현황.csv'
+INSTITUTION_RATE_CSV = '연도별_기관별_부실률.csv'
+INSTITUTION_COUNT_CSV = '연도별_기관별_대출 및 부실건수.csv'
+
+
+def cube_frame(cube):
+    """큐브 쿼리 결과의 month / reported_watermark 를 datetime 으로"""
+    cube['month'] = pd.to_datetime(cube['month'])
+    cube['reported_watermark'] = pd.to_datetime(cube['reported_watermark'])
+    return cube
+
+
+def fetch_loss_cube(conn, start_year=START_YEAR, end_year=END_YEAR):
+    """[start_year, end_year] 에 개설된 대출의 월 x 기관 x bureau 큐브 (쿼리 한 번)"""
+    params = {'start': f'{start_year}-01-01', 'end': f'{end_year + 1}-01-01'}
+    return cube_frame(fetch_frame(conn, LOSS_CUBE_QUERY, params))
+
+
+def period_labels(months, granularity):
+    """
+    월 (datetime) -> 기간 이름.
+    month: 2015-01, quarter: 2015 Q1, half: 2015 상반기, year: 2015
+    """
+    months = pd.DatetimeIndex(months)
+    year = months.year.astype(str)
+    if granularity == 'month':
+        return months.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return year + ' Q' + months.quarter.astype(str)
+    if granularity == 'half':
+        return year + np.where(months.month <= 6, ' 상반기', ' 하반기')
+    if granularity == 'year':
+        return year
+    raise ValueError(f"지원하지 않는 기간 단위입니다: {granularity} (month / quarter / half / year)")
+
+
+def all_periods(granularity, start_year=START_YEAR, end_year=END_YEAR):
+    """거래가 없는 기간도 포함한 기간 이름 목록 (시간 순)"""
+    months = pd.date_range(f'{start_year}-01-01', f'{end_year}-12-01', freq='MS')
+    return pd.unique(period_labels(months, granularity))
+
+
+def truncated_rate(lost, total):
+    """
+    부실률 = lost / total 을 소수 둘째 자리에서 버림 (노트북의 TRUNC(CAST(... AS NUMERIC), 2)).
+    float -> numeric 변환처럼 먼저 유효 자리에서 반올림해 0.29 -> 0.28 같은 오차를 막는다.
+    total 이 0 이면 0.
+    """
+    lost = np.asarray(lost, dtype=float)
+    total = np.asarray(total, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(total > 0, lost / total, 0.0)
+    return np.floor(np.round(rate * 100, 9)) / 100
+
+
+def rollup(cube, granularity='month', by=()):
+    """
+    큐브를 (기간, *by) 로 다시 묶는다.
+    반환: period, *by, total_count, lost_count, loan_amount, lost_amount, default_rate
+    """
+    by = list(by)
+    frame = cube[by + CUBE_MEASURES].copy()
+    frame.insert(0, 'period', period_labels(cube['month'], granularity))
+    res = frame.groupby(['period'] + by, dropna=False, sort=True)[CUBE_MEASURES].sum().reset_index()
+    res['default_rate'] = truncated_rate(res['lost_count'], res['total_count'])
+    return res
+
+
+def period_report(cube, granularity, lost_column, start_year=START_YEAR, end_year=END_YEAR):
+    """기간별 총 대출 수 / 부실 대출 수 (대출이 없는 기간은 0)"""
+    res = (rollup(cube, granularity)
+           .set_index('period')
+           .reindex(all_periods(granularity, start_year, end_year), fill_value=0))
+    return pd.DataFrame({
+        '기간': res.index,
+        '총 대출 수': res['total_count'].astype(int).to_numpy(),
+        lost_column: res['lost_count'].astype(int).to_numpy(),
+    })
+
+
+def institution_year_table(cube, institutions, start_year=START_YEAR, end_year=END_YEAR):
+    """institutionName x 연도 별 (total_count, lost_count). index=institutions, columns=(measure, year)"""
+    years = [str(year) for year in range(start_year, end_year + 1)]
+    res = rollup(cube[cube['institutionName'].isin(institutions)], 'year', by=['institutionName'])
+    table = res.pivot_table(index='institutionName', columns='period',
+                            values=['total_count', 'lost_count'], aggfunc='sum', fill_value=0)
+    full_columns = pd.MultiIndex.from_product([['total_count', 'lost_count'], years])
+    return table.reindex(index=list(institutions), columns=full_columns, fill_value=0)
+
+
+def institution_rate_report(cube, institutions=RATE_INSTITUTIONS, start_year=START_YEAR, end_year=END_YEAR):
+    """연도별_기관별_부실률.csv 형식 (전체기관, 연도별 부실률)"""
+    table = institution_year_table(cube, institutions, start_year, end_year)
+    res = pd.DataFrame({'전체기관': list(institutions)})
+    for year in range(start_year, end_year + 1):
+        res[f'{year} 부실률'] = truncated_rate(table[('lost_count', str(year))], table[('total_count', str(year))])
+    return res
+
+
+def institution_count_report(cube, institutions=COUNT_INSTITUTIONS, start_year=START_YEAR, end_year=END_YEAR):
+    """연도별_기관별_대출 및 부실건수.csv 형식 (전체기관, 연도별 대출 건수 / 부실 건수)"""
+    table = institution_year_table(cube, institutions, start_year, end_year)
+    res = pd.DataFrame({'전체기관': list(institutions)})
+    for year in range(start_year, end_year + 1):
+        res[f'{year} 대출 건수'] = table[('total_count', str(year))].astype(int).to_numpy()
+        res[f'{year} 부실 건수'] = table[('lost_count', str(year))].astype(int).to_numpy()
+    return res
+
+
+def write_reports(cube, output_dir='.', start_year=START_YEAR, end_year=END_YEAR):
+    """노트북들이 만들던 CSV 4개를 큐브 하나로 한 번에 쓴다. 반환: {파일 경로: 행 수}"""
+    reports = {
+        MONTHLY_CSV: period_report(cube, 'month', '부실 대출 수', start_year, end_year),
+        HALF_YEAR_CSV: period_report(cube, 'half', '부실 대출 수 (lost)', start_year, end_year),
+        INSTITUTION_RATE_CSV: institution_rate_report(cube, RATE_INSTITUTIONS, start_year, end_year),
+        INSTITUTION_COUNT_CSV: institution_count_report(cube, COUNT_INSTITUTIONS, start_year, end_year),
+    }
+    written = {}
+    for name, report in reports.items():
+        path = os.path.join(output_dir, name)
+        report.to_csv(path, index=False, encoding='utf-8-sig')
+        written[path] = len(report)
+    return written
+
+
+# ---------------------------------------------------------------------------
+# 저장된 큐브 증분 갱신 (개설 월 단위 high-water mark)
+# ---------------------------------------------------------------------------
+
+CUBE_PATH = 'loss_cube.parquet'
+
+# 큐브 행마다 붙는 갱신 정보
+#   reported_watermark : 그 그룹 행들의 max "reportedAt"
+#   computed_at        : 그 개설 월을 집계한 now
+#   start_year         : 큐브를 만든 조회 시작 연도 (다르면 전체 다시 집계)
+CUBE_META_COLUMNS = ['reported_watermark', 'computed_at', 'start_year']
+
+# 저장된 watermark 보다 "reportedAt" 이 새로운 행이 있는 개설 월.
+# ("reportedAt" 인덱스가 있으면 비용은 새로 들어온 행 수에 비례한다)
+CHANGED_MONTHS_QUERY = '''
+    SELECT DISTINCT date_trunc('month', ch."openedAt")::date AS "month"
+    FROM credit_history ch
+    WHERE ch."reportedAt" > %(watermark)s
+        AND ch."openedAt" >= %(start)s
+        AND ch."openedAt" < %(end)s
+'''
+
+# 지정한 개설 월들만 LOSS_CUBE_QUERY 와 같은 형태로 다시 집계
+MONTHS_CUBE_QUERY = '''
+    WITH "m" AS (
+        SELECT unnest(%(months)s::date[]) AS "month"
+    )
+    SELECT
+        "m"."month",
+        ch."institutionName",
+        ch."identifiedInstitution",
+        ch."bureau",
+        COUNT(ch."createdAt") AS "total_count",
+        COUNT(*) FILTER (WHERE ch."status" = 'lost') AS "lost_count",
+        COALESCE(SUM(ch."loanAmount"), 0)::float8 AS "loan_amount",
+        COALESCE(SUM(ch."loanAmount") FILTER (WHERE ch."status" = 'lost'), 0)::float8 AS "lost_amount",
+        MAX(ch."reportedAt") AS "reported_watermark"
+    FROM "m"
+    INNER JOIN credit_history ch
+        ON ch."openedAt" >= "m"."month"
+        AND ch."openedAt" < "m"."month" + interval '1 month'
+    GROUP BY 1, 2, 3, 4
+'''
+
+
+def load_cube(path=CUBE_PATH):
+    """저장된 큐브 (없으면 None)"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def save_cube(cube, path=CUBE_PATH):
+    """tmp 파일에 쓰고 바꿔치기 (중간에 죽어도 이전 큐브는 남음)"""
+    tmp_path = path + '.tmp'
+    cube.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def fetch_changed_months(conn, watermark, start, end):
+    """watermark 이후 "reportedAt" 행이 생긴 개설 월 목록 (datetime)"""
+    params = {'watermark': watermark.to_pydatetime(), 'start': start, 'end': end}
+    months = fetch_frame(conn, CHANGED_MONTHS_QUERY, params)['month']
+    return sorted(pd.to_datetime(months).dropna())
+
+
+def fetch_months_cube(conn, months):
+    """지정한 개설 월들만 다시 집계한 큐브"""
+    params = {'months': [month.date() for month in months]}
+    return cube_frame(fetch_frame(conn, MONTHS_CUBE_QUERY, params))
+
+
+def refresh_loss_cube(conn, now, path=CUBE_PATH, start_year=START_YEAR, full=False):
+    """
+    저장된 큐브를 증분 갱신하고 전체 큐브를 반환.
+    범위는 start_year 1월 ~ now 가 속한 해 말. 저장된 watermark 이후 "reportedAt" 행이
+    생긴 개설 월만 MONTHS_CUBE_QUERY 로 다시 집계해 그 월의 행을 통째로 바꾼다
+    (상태가 lost 로 바뀌면서 "reportedAt" 도 갱신된 기존 대출은 그 월 재집계로 반영).
+    파일이 없거나, full 이거나, 저장된 큐브의 start_year 가 다르면 전체 집계.
+    "reportedAt" 만 보므로 행 삭제, "reportedAt" 이 그대로인 status 변경,
+    watermark 보다 과거 "reportedAt" 으로 뒤늦게 들어온 행은 잡지 못한다 (full=True 로 다시 만들 것).
+    """
+    now = pd.Timestamp(now)
+    start, end = f'{start_year}-01-01', f'{now.year + 1}-01-01'
+    cube = None if full else load_cube(path)
+    if cube is not None and ('start_year' not in cube or (cube['start_year'] != start_year).any()):
+        cube = None  # 조회 범위가 달라진 큐브 (또는 start_year 가 없는 예전 파일)
+    watermark = None if cube is None else cube['reported_watermark'].max()
+
+    if cube is None or pd.isna(watermark):
+        rebuilt = fetch_loss_cube(conn, start_year, now.year)
+        months, kept = None, None
+    else:
+        months = fetch_changed_months(conn, watermark, start, end)
+        rebuilt = fetch_months_cube(conn, months) if months else cube.iloc[:0].drop(columns=['computed_at', 'start_year'])
+        kept = cube[~cube['month'].isin(months)]
+    rebuilt['computed_at'] = now.tz_localize('UTC') if now.tzinfo is None else now.tz_convert('UTC')
+    rebuilt['start_year'] = start_year
+
+    if kept is not None and len(kept):
+        rebuilt = pd.concat([kept, rebuilt], ignore_index=True) if len(rebuilt) else kept
+    cube = rebuilt.sort_values(['month'] + CUBE_DIMENSIONS, ignore_index=True)
+
+    save_cube(cube, path)
+    changed = '전체' if months is None else f"{len(months)}개월"
+    print(f"[loss_rates] {changed} 재집계 -> {path} ({len(cube)}행)")
+    return cube
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='credit_history 기간별 / 기관별 대출 및 부실 현황 CSV')
+    parser.add_argument('--output-dir', default='.', help='CSV 를 쓸 디렉터리')
+    parser.add_argument('--start-year', type=int, default=START_YEAR)
+    parser.add_argument('--end-year', type=int, default=END_YEAR)
+    parser.add_argument('--cube', default=None,
+                        help='저장된 큐브 Parquet 경로. 주면 증분 갱신한 큐브로 리포트를 만든다')
+    parser.add_argument('--full', action='store_true',
+                        help='--cube 를 전체 다시 집계 (행 삭제 / reportedAt 이 그대로인 status 변경 반영)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import trusty_db
+
+    args = parse_args(argv)
+    start = time.perf_counter()
+    with trusty_db.connection() as conn:
+        if args.cube:
+            cube = refresh_loss_cube(conn, pd.Timestamp.now(tz='UTC'), args.cube, args.start_year, args.full)
+        else:
+            cube = fetch_loss_cube(conn, args.start_year, args.end_year)
+    fetched = time.perf_counter()
+
+    written = write_reports(cube, args.output_dir, args.start_year, args.end_year)
+    for path, n_rows in written.items():
+        print(f"{path}: {n_rows}행")
+    print(f"(큐브 {len(cube)}행 조회 {fetched - start:.2f}s, 리포트 {time.perf_counter() - fetched:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
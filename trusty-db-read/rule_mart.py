@@ -0,0 +1,1057 @@
+"""
+rule-mart.ipynb 의 유저별 룰 마트 계산을 전체 유저 단위로 한 번에 하는 모듈.
+
+노트북의 calculate_daily_account_balance / get_user_daily_balance 는
+계좌마다 (OPay 면 지갑마다) 쿼리를 날리고 시작일 잔고를 위해 한 번 더 조회한다.
+여기서는 같은 계산을 집합 단위 SQL 한 번으로 한다.
+
+    daily = get_daily_balances(conn, now, [u.id for u in users])
+    export_daily_balances(conn, now, 'all_users_daily_balance.csv', [u.id for u in users])
+
+build_rule_mart 는 get_user_df 와 같은 DataFrame 을 유저별 쿼리 대신
+전체 유저에 대한 GROUP BY 쿼리 몇 개로 만든다.
+
+    mart = build_rule_mart(conn, now)
+
+refresh_rule_mart 는 결과를 Parquet 마트 파일에 유저별로 upsert 하고,
+지난 실행 이후 거래 / CB 행이 새로 들어온 유저만 다시 계산한다.
+
+    mart = refresh_rule_mart(conn, now, 'rule_mart.parquet')
+
+도박 룰은 기본적으로 bank_transaction_category 의 'gambling' 카테고리를 쓴다.
+classify_narration=True 면 인증 계좌 거래를 서버 사이드 커서로 청크씩 읽어 narration 을
+GAMBLING_MERCHANTS 패턴으로도 분류한다 (카테고리 or narration 매칭).
+
+    mart = build_rule_mart(conn, now, classify_narration=True)
+
+노트북처럼 유저마다 결과를 따로 만드는 경로는 ResultColumns 에 유저 단위로 채운다
+(필드별로 미리 할당한 배열, 유저마다 dict / dataclass 를 쌓지 않음).
+
+    result = ResultColumns(field_dtypes(User, UserBsResult, CbResult), len(users))
+    result.set(i, **user.to_dict())
+    df = result.to_frame()
+
+일별 잔고는 날짜 객체 목록 대신 시작일부터의 day offset 을 인덱스로 하는
+길이 BALANCE_DAYS 의 float 배열로 다룬다 (계좌 / 지갑 합산 = 배열 덧셈).
+"""
+import dataclasses
+import os
+import re
+from datetime import timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+NST = timezone(timedelta(hours=1))
+
+# 최근 며칠치 잔고를 볼지 (오늘 포함)
+BALANCE_DAYS = 90
+
+# 계좌(OPay 는 지갑) x 날짜별 마지막 잔고를 90일 전체로 채워 유저별로 합산.
+#   ledgers    : 잔고를 따로 계산할 단위. OPay 계좌는 wallet / owealth 두 개
+#   daily_last : DISTINCT ON 으로 ledger x 날짜별 마지막 거래 잔고
+#   opening    : 시작일에 거래가 없을 때 쓰는 시작 잔고
+#                = 시작 시각 이후 첫 거래의 거래 전 잔고 (지갑 구분 없이, 노트북과 동일)
+#   marked     : generate_series 날짜 격자에 붙이고, 잔고가 있는 날마다 grp 를 1씩 올림
+#   filled     : 같은 grp 안에서는 그 grp 첫 날 잔고를 그대로 이어 씀 (carry-forward)
+DAILY_BALANCE_QUERY = '''
+    WITH "ledgers" AS (
+        SELECT "ba"."id" AS "bankAccountId", "ba"."userId", "w"."walletType"
+        FROM "bank_account" "ba"
+        INNER JOIN "bank" "b"
+            ON "b"."id" = "ba"."bankId"
+        CROSS JOIN LATERAL unnest(
+            CASE
+                WHEN "b"."parseFunctionName" = 'opay' THEN ARRAY['wallet', 'owealth']
+                ELSE ARRAY[NULL::text]
+            END
+        ) AS "w"("walletType")
+        WHERE "ba"."forCertification" = true
+            AND "ba"."discardedAt" IS NULL
+            {user_filter}
+    ), "daily_last" AS (
+        SELECT DISTINCT ON ("l"."bankAccountId", "l"."walletType", "bt"."transactionAt"::date)
+            "l"."bankAccountId",
+            "l"."walletType",
+            "bt"."transactionAt"::date AS "day",
+            "bt"."balance"
+        FROM "ledgers" "l"
+        INNER JOIN "bank_transaction" "bt"
+            ON "bt"."bankAccountId" = "l"."bankAccountId"
+            AND ("l"."walletType" IS NULL OR "bt"."oPayWalletType"::text = "l"."walletType")
+        WHERE "bt"."transactionAt" >= %(start_at)s
+            AND "bt"."balance" IS NOT NULL
+        ORDER BY "l"."bankAccountId", "l"."walletType", "bt"."transactionAt"::date,
+            "bt"."transactionAt" DESC, "bt"."id" DESC
+    ), "opening" AS (
+        SELECT DISTINCT ON ("bt"."bankAccountId")
+            "bt"."bankAccountId",
+            CASE
+                WHEN "bt"."type" = 'debit' THEN "bt"."balance" + "bt"."amount"
+                ELSE "bt"."balance" - "bt"."amount"
+            END AS "balance"
+        FROM "bank_transaction" "bt"
+        WHERE "bt"."bankAccountId" IN (SELECT "bankAccountId" FROM "ledgers")
+            AND "bt"."transactionAt" >= %(start_at)s
+            AND "bt"."balance" IS NOT NULL
+        ORDER BY "bt"."bankAccountId", "bt"."transactionAt" ASC, "bt"."id" ASC
+    ), "marked" AS (
+        SELECT
+            "l"."userId",
+            "l"."bankAccountId",
+            "l"."walletType",
+            "d"."day",
+            "dl"."balance",
+            COUNT("dl"."balance") OVER (
+                PARTITION BY "l"."bankAccountId", "l"."walletType"
+                ORDER BY "d"."day"
+            ) AS "grp"
+        FROM "ledgers" "l"
+        CROSS JOIN (
+            SELECT generate_series(%(start_day)s::date, %(today)s::date, interval '1 day')::date AS "day"
+        ) "d"
+        LEFT JOIN "daily_last" "dl"
+            ON "dl"."bankAccountId" = "l"."bankAccountId"
+            AND "dl"."walletType" IS NOT DISTINCT FROM "l"."walletType"
+            AND "dl"."day" = "d"."day"
+    ), "filled" AS (
+        SELECT
+            "m"."userId",
+            "m"."day",
+            CASE
+                WHEN "m"."grp" = 0 THEN COALESCE("o"."balance", 0)
+                ELSE FIRST_VALUE("m"."balance") OVER (
+                    PARTITION BY "m"."bankAccountId", "m"."walletType", "m"."grp"
+                    ORDER BY "m"."day"
+                )
+            END AS "balance"
+        FROM "marked" "m"
+        LEFT JOIN "opening" "o"
+            ON "o"."bankAccountId" = "m"."bankAccountId"
+    )
+    SELECT "userId", "day", SUM("balance")::float8 AS "balance"
+    FROM "filled"
+    GROUP BY "userId", "day"
+    ORDER BY "userId", "day"
+'''
+
+
+def start_of_day(dt):
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def fetch_frame(conn, qry, params=None):
+    """쿼리 결과를 DataFrame 으로 (실패 시 rollback)"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(qry, params)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+    except Exception:
+        conn.rollback()
+        raise
+    return pd.DataFrame(rows, columns=columns)
+
+
+def fetch_frames(conn, qry, params=None, chunksize=100_000):
+    """named(서버 사이드) 커서로 쿼리 결과를 chunksize 행씩 DataFrame 으로 yield (실패 시 rollback)"""
+    try:
+        with conn.cursor(name='rule_mart_stream') as cursor:
+            cursor.execute(qry, params)
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def balance_window(now, days=BALANCE_DAYS):
+    """(시작일 0시, 오늘 0시) - 노트북의 start_date / today 와 동일"""
+    today = start_of_day(now)
+    return today - timedelta(days=days - 1), today
+
+
+def forward_fill_balances(offsets, balances, opening=0.0, days=BALANCE_DAYS):
+    """
+    (day offset, 잔고) 목록 -> 길이 days 의 일별 잔고 배열.
+    - offsets / balances 는 거래 순서대로. 같은 날은 마지막 거래 잔고
+    - 범위 [0, days) 밖의 offset 은 무시
+    - 0번째 날에 잔고가 없으면 opening, 이후 빈 날은 직전 잔고를 이어 씀
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    balances = np.asarray(balances, dtype=float)
+    in_range = (offsets >= 0) & (offsets < days)
+    offsets, balances = offsets[in_range], balances[in_range]
+
+    # 뒤집은 뒤 np.unique 의 첫 위치 = 각 날짜의 마지막 거래
+    last_slot, last_pos = np.unique(offsets[::-1], return_index=True)
+    dense = np.full(days, np.nan)
+    dense[last_slot] = balances[::-1][last_pos]
+    if np.isnan(dense[0]):
+        dense[0] = opening
+
+    has_value = ~np.isnan(dense)
+    filled_from = np.maximum.accumulate(np.where(has_value, np.arange(days), 0))
+    return dense[filled_from]
+
+
+def balance_matrix(daily, user_ids, start_date, days=BALANCE_DAYS):
+    """
+    get_daily_balances 결과 (user_id, date, balance) -> (len(user_ids), days) 배열.
+    i 번째 행 = user_ids[i], 없는 칸은 0.
+    """
+    user_pos = pd.Index(list(user_ids)).get_indexer(daily['user_id'])
+    offsets = (pd.to_datetime(daily['date']) - pd.Timestamp(start_date.date())).dt.days.to_numpy()
+    ok = (user_pos >= 0) & (offsets >= 0) & (offsets < days)
+
+    matrix = np.zeros((len(user_ids), days))
+    matrix[user_pos[ok], offsets[ok]] = daily['balance'].to_numpy(dtype=float)[ok]
+    return matrix
+
+
+def get_daily_balances(conn, now, user_ids=None, days=BALANCE_DAYS):
+    """
+    유저별 최근 days 일 일별 총 잔고 (get_user_daily_balance 의 전체 유저 버전).
+    user_ids 를 주면 그 유저들만 조회하고, 인증 계좌가 없는 유저도 잔고 0 으로 days 행을 채운다.
+    반환: columns=user_id, date, balance (user_id, date 순 정렬)
+    """
+    start_date, today = balance_window(now, days)
+    user_filter = 'AND "ba"."userId" = ANY(%(user_ids)s)' if user_ids is not None else ''
+    params = {
+        'start_at': start_date.strftime('%Y-%m-%dT00:00:00%z'),
+        'start_day': start_date.date(),
+        'today': today.date(),
+        'user_ids': list(user_ids) if user_ids is not None else None,
+    }
+    res = fetch_frame(conn, DAILY_BALANCE_QUERY.format(user_filter=user_filter), params)
+    res.columns = ['user_id', 'date', 'balance']
+    if user_ids is None:
+        return res
+
+    full_index = pd.MultiIndex.from_product(
+        [list(user_ids), pd.date_range(start_date.date(), today.date()).date],
+        names=['user_id', 'date'])
+    return (res.set_index(['user_id', 'date'])['balance']
+            .reindex(full_index, fill_value=0.0)
+            .reset_index())
+
+
+# export_daily_balances 가 한 번에 조회 / 기록하는 유저 수
+EXPORT_CHUNK_USERS = 5_000
+
+
+def balance_date_labels(now, days=BALANCE_DAYS, fmt='%-m/%-d/%y'):
+    """잔고 배열 각 칸의 날짜 문자열 (all_users_daily_balance.csv 의 date 형식)"""
+    start_date, _ = balance_window(now, days)
+    return pd.date_range(start_date.date(), periods=days).strftime(fmt).to_numpy(dtype=object)
+
+
+def export_daily_balances(conn, now, path, user_ids, chunk_users=EXPORT_CHUNK_USERS, days=BALANCE_DAYS):
+    """
+    all_users_daily_balance.csv 를 chunk_users 명씩 이어 쓴다.
+    청크마다 get_daily_balances 한 번 -> (유저, 일) 행렬 -> np.repeat / np.tile 로
+    user_id / date 컬럼을 만들고 바로 기록하므로 시간은 유저 수에 선형, 메모리는 청크 크기만큼.
+    형식은 노트북 export 와 같다 (0부터 이어지는 index 컬럼, 잔고 / 100 소수 2자리).
+    반환: 기록한 행 수
+    """
+    start_date, _ = balance_window(now, days)
+    labels = balance_date_labels(now, days)
+    user_ids = list(user_ids)
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if not user_ids:
+            pd.DataFrame(columns=['user_id', 'date', 'balance']).to_csv(f)
+        for start in range(0, len(user_ids), chunk_users):
+            chunk = user_ids[start:start + chunk_users]
+            matrix = balance_matrix(get_daily_balances(conn, now, chunk, days), chunk, start_date, days)
+            frame = pd.DataFrame({
+                'user_id': np.repeat(chunk, days),
+                'date': np.tile(labels, len(chunk)),
+                'balance': np.round(matrix.ravel() / 100, 2),
+            }, index=pd.RangeIndex(written, written + matrix.size))
+            frame.to_csv(f, header=(start == 0))
+            written += len(frame)
+    return written
+
+
+# ---------------------------------------------------------------------------
+# 전체 유저 룰 마트 (get_user_df 의 bulk 버전)
+# ---------------------------------------------------------------------------
+
+# get_user_df 결과 컬럼 (User / UserBsResult / CbResult 필드 순서)
+USER_COLUMNS = ['id', 'bs_success', 'bs_fail_reason', 'cb_done', 'cb_success']
+WEEK_SLOTS = 12
+BS_COLUMNS = (
+    ['has_recent_data', 'recent_data_date',
+     'recent_90_spending_success', 'recent_90_spending_count',
+     'recent_30_spending_success', 'recent_30_spending_count',
+     'less_than_500_days_count', 'more_than_5000_days_count',
+     'balance_composite_success', 'balance_maintain_success', 'balance_empty_success',
+     'balance_recent_maintain_success', 'balance_recent_empty_success']
+    + [f'week_{i}_{field}' for i in range(WEEK_SLOTS) for field in ('weekday', 'pay')]
+    + ['weekly_pay_success', 'month_0_pay', 'month_1_pay', 'month_2_pay',
+       'monthly_pay_success', 'occasional_pay_success',
+       'gambling_average_spend_amount', 'gambling_month_average_spend_count', 'gambling_rule_1_success',
+       'gambling_month_average_deposit_amount', 'gambling_month_average_spend_amount',
+       'gambling_rule_2_success']
+)
+CB_COLUMNS = ['total_lost_count', 'recent_loan_success', 'recent_loan_count',
+              'lost_institution_success', 'lost_institution_count',
+              'recent_small_lost_success', 'recent_small_lost_count',
+              'first_loan_lost_success', 'first_loan_at', 'first_loan_amount']
+
+# get_users 와 동일
+USERS_QUERY = '''
+    SELECT
+        "u"."id",
+        CASE
+            WHEN "ea"."status" = 'approved' THEN TRUE
+            WHEN "ea"."status" = 'rejected' THEN FALSE
+            ELSE NULL
+        END AS "bs_success",
+        "ea"."rejectReasonCode" AS "bs_fail_reason",
+        EXISTS (
+            SELECT 1
+            FROM "loan_assessment"
+            WHERE "userId" = "u"."id" AND "cbStatus" IS NOT NULL
+        ) AS "cb_done",
+        CASE
+            WHEN EXISTS (
+                SELECT 1
+                FROM "loan_assessment"
+                WHERE "userId" = "u"."id" AND "cbStatus" = 'rejected'
+            ) THEN FALSE
+            ELSE TRUE
+        END AS "cb_success"
+    FROM "user" "u"
+    LEFT JOIN LATERAL (
+        SELECT *
+        FROM "earning_assessment"
+        WHERE
+            "userId" = "u"."id"
+            AND "status" != 'calculating'
+            AND "userTestId" IS NULL
+        ORDER BY "createdAt" DESC
+        LIMIT 1
+    ) "ea" ON TRUE
+    WHERE
+        EXISTS (
+            SELECT 1
+            FROM "bs_parse_request" "r"
+            INNER JOIN "bank_account" "a"
+                ON "a"."id" = "r"."bankAccountId"
+            WHERE
+                "a"."userId" = "u"."id"
+                AND "r"."status" = 'completed'
+        ) AND "ea"."status" IS NOT NULL
+    ORDER BY "u"."id" ASC
+'''
+
+# 최근 30 / 90일 거래 수, 최근 데이터 날짜, 가장 오래된 거래일 (전체 계좌)
+ACTIVITY_QUERY = '''
+    SELECT
+        "ba"."userId",
+        COUNT(*) FILTER (WHERE "bt"."transactionAt" >= %(since_90)s) AS "recent_90_spending_count",
+        COUNT(*) FILTER (WHERE "bt"."transactionAt" >= %(since_30)s) AS "recent_30_spending_count",
+        to_char(MAX("bt"."transactionAt") FILTER (WHERE "bt"."transactionAt" >= %(since_30)s), 'YYYY-MM-DD')
+            AS "recent_data_date",
+        date_trunc('day', MIN("bt"."transactionAt")) AS "oldest_transaction_day"
+    FROM "bank_transaction" "bt"
+    INNER JOIN "bank_account" "ba"
+        ON "ba"."id" = "bt"."bankAccountId"
+    WHERE "ba"."userId" = ANY(%(user_ids)s)
+    GROUP BY "ba"."userId"
+'''
+
+# 급여성 입금 (도박 / simple / opay_autosave 카테고리 제외)
+PAY_CREDIT_FILTER = '''"ba"."userId" = ANY(%(user_ids)s)
+        AND "bt"."type" = 'credit'
+        AND "bt"."transactionAt" >= %(since_90)s
+        AND NOT EXISTS (
+            SELECT 1
+            FROM "bank_transaction_category" "btc"
+            WHERE "btc"."bankTransactionId" = "bt"."id"
+                AND "btc"."type" IN ('gambling', 'simple', 'opay_autosave')
+        )'''
+
+# 급여성 입금 거래 (주급 / 월급 룰은 pay_result 에서 한 번에 계산)
+PAY_CREDITS_QUERY = '''
+    SELECT "ba"."userId", "bt"."transactionAt", "bt"."amount"::float8 AS "amount"
+    FROM "bank_transaction" "bt"
+    INNER JOIN "bank_account" "ba" ON "ba"."id" = "bt"."bankAccountId"
+    WHERE {credit_filter}
+'''.format(credit_filter=PAY_CREDIT_FILTER)
+
+# 인증 계좌의 도박 카테고리 거래 (전체 기간)
+GAMBLING_QUERY = '''
+    SELECT
+        "ba"."userId",
+        COUNT(*) FILTER (WHERE "bt"."type" = 'debit') AS "spend_count",
+        COALESCE(SUM("bt"."amount") FILTER (WHERE "bt"."type" = 'debit'), 0)::float8 AS "spend_amount",
+        COALESCE(SUM("bt"."amount") FILTER (WHERE "bt"."type" = 'credit'), 0)::float8 AS "deposit_amount"
+    FROM "bank_transaction" "bt"
+    INNER JOIN "bank_account" "ba" ON "ba"."id" = "bt"."bankAccountId"
+    WHERE "ba"."userId" = ANY(%(user_ids)s)
+        AND "ba"."forCertification" = true
+        AND "ba"."discardedAt" IS NULL
+        AND EXISTS (
+            SELECT 1
+            FROM "bank_transaction_category" "btc"
+            WHERE "btc"."bankTransactionId" = "bt"."id"
+                AND "btc"."type" = 'gambling'
+        )
+    GROUP BY "ba"."userId"
+'''
+
+# 도박 업체 이름 (narration 에 이 문자열이 있으면 도박 거래, 대소문자 무시)
+GAMBLING_MERCHANTS = [
+    'bet9ja', 'sportybet', 'nairabet', 'betking', '1xbet', 'merrybet', 'betway',
+    'msport', 'bangbet', 'betbonanza', 'accessbet', 'naijabet', 'supabets',
+    'parimatch', 'paripesa', '22bet', 'betano', 'livescorebet', 'surebet247',
+    'wazobet', 'cloudbet', 'betland',
+]
+
+# GAMBLING_TRANSACTIONS_QUERY 를 한 번에 읽어 오는 행 수 (청크마다 유저별로 집계해 더함)
+GAMBLING_CHUNK_ROWS = 200_000
+
+# 인증 계좌의 입출금 거래 + 도박 카테고리 여부 (narration 분류용, 전체 기간)
+GAMBLING_TRANSACTIONS_QUERY = '''
+    SELECT
+        "ba"."userId",
+        "bt"."type",
+        "bt"."amount"::float8 AS "amount",
+        "bt"."narration",
+        EXISTS (
+            SELECT 1
+            FROM "bank_transaction_category" "btc"
+            WHERE "btc"."bankTransactionId" = "bt"."id"
+                AND "btc"."type" = 'gambling'
+        ) AS "categorized"
+    FROM "bank_transaction" "bt"
+    INNER JOIN "bank_account" "ba" ON "ba"."id" = "bt"."bankAccountId"
+    WHERE "ba"."userId" = ANY(%(user_ids)s)
+        AND "ba"."forCertification" = true
+        AND "ba"."discardedAt" IS NULL
+        AND "bt"."type" IN ('debit', 'credit')
+'''
+
+# get_cb_result 의 쿼리 5개를 유저별 집계 + 최초 대출 DISTINCT ON 으로
+# (lost_institution_count 는 GROUP BY "identifiedInstitution" 처럼 NULL 기관도 한 그룹으로 센다)
+CB_QUERY = '''
+    WITH "lost_excl" AS (
+        SELECT *
+        FROM "credit_history"
+        WHERE "userId" = ANY(%(user_ids)s)
+            AND "status" = 'lost'
+            AND NOT ("identifiedInstitution" = 'aella financial solution ltd' AND "bureau" = 'crc')
+    ), "counts" AS (
+        SELECT
+            "userId",
+            COUNT(*) FILTER (WHERE "status" = 'lost') AS "total_lost_count",
+            COUNT(*) FILTER (
+                WHERE "status" = 'performing'
+                    AND "openedAt" >= %(one_year_ago)s
+                    AND "reportedAt" < %(today)s
+                    AND "dueAt" < %(today)s
+            ) AS "recent_loan_count"
+        FROM "credit_history"
+        WHERE "userId" = ANY(%(user_ids)s)
+        GROUP BY "userId"
+    ), "lost" AS (
+        SELECT
+            "userId",
+            COUNT(DISTINCT "identifiedInstitution")
+                + MAX(CASE WHEN "identifiedInstitution" IS NULL THEN 1 ELSE 0 END) AS "lost_institution_count",
+            COUNT(*) FILTER (
+                WHERE "openedAt" >= %(two_years_ago)s AND "loanAmount" < 10000
+            ) AS "recent_small_lost_count"
+        FROM "lost_excl"
+        GROUP BY "userId"
+    ), "first_loan" AS (
+        SELECT DISTINCT ON ("userId")
+            "userId",
+            "openedAt" AS "first_loan_at",
+            "loanAmount" AS "first_loan_amount",
+            "status" AS "first_loan_status",
+            "identifiedInstitution" AS "first_loan_institution",
+            "bureau" AS "first_loan_bureau"
+        FROM "credit_history"
+        WHERE "userId" = ANY(%(user_ids)s)
+        ORDER BY "userId", "openedAt" ASC
+    )
+    SELECT
+        "c"."userId",
+        "c"."total_lost_count",
+        "c"."recent_loan_count",
+        COALESCE("l"."lost_institution_count", 0) AS "lost_institution_count",
+        COALESCE("l"."recent_small_lost_count", 0) AS "recent_small_lost_count",
+        "f"."first_loan_at",
+        "f"."first_loan_amount",
+        "f"."first_loan_status",
+        "f"."first_loan_institution",
+        "f"."first_loan_bureau"
+    FROM "counts" "c"
+    LEFT JOIN "lost" "l" ON "l"."userId" = "c"."userId"
+    LEFT JOIN "first_loan" "f" ON "f"."userId" = "c"."userId"
+'''
+
+
+def get_users_frame(conn):
+    """get_users 와 같은 유저 목록 (columns=USER_COLUMNS)"""
+    users = fetch_frame(conn, USERS_QUERY)
+    users.columns = USER_COLUMNS
+    return users
+
+
+def by_user(frame, user_ids, columns, fill=None):
+    """userId 컬럼 기준 결과를 user_ids 순서로 맞춘다 (없는 유저는 fill)"""
+    frame = frame.set_index('userId').reindex(list(user_ids))
+    if fill is not None:
+        frame = frame.fillna(fill)
+    return frame[columns].reset_index(drop=True)
+
+
+def balance_result(balances):
+    """(유저, 90일) 잔고 배열 -> 잔고 룰 컬럼"""
+    recent_30 = balances[:, -30:]
+    res = pd.DataFrame({
+        'less_than_500_days_count': (balances < 50000).sum(axis=1),
+        'more_than_5000_days_count': (balances >= 500000).sum(axis=1),
+    })
+    recent_more_than_5000_days_count = (recent_30 >= 500000).sum(axis=1)
+    recent_less_than_500_days_count = (recent_30 < 50000).sum(axis=1)
+
+    res['balance_composite_success'] = (res['less_than_500_days_count'] < 40) | (res['more_than_5000_days_count'] >= 15)
+    res['balance_maintain_success'] = res['more_than_5000_days_count'] >= 10
+    res['balance_empty_success'] = res['less_than_500_days_count'] < 48
+    res['balance_recent_maintain_success'] = recent_more_than_5000_days_count >= 3
+    res['balance_recent_empty_success'] = recent_less_than_500_days_count < 10
+    return res
+
+
+def pay_bins(credits, now):
+    """
+    입금 거래 (userId, transactionAt, amount) -> (주별 합계, 30일 구간별 최대 / 합계).
+      - 주: 거래 시각의 timezone 기준 그 주 월요일 (노트북의 week_key 와 동일)
+      - 30일 구간 i: now - (30i + 29)일 <= transactionAt <= now - 30i일, i = 0, 1, 2
+        (구간 사이의 하루는 노트북 periods 처럼 어느 구간에도 안 들어감)
+    반환: weekly(userId, week, pay), monthly(userId, month_{i}_max, month_{i}_total)
+    """
+    at = pd.to_datetime(credits['transactionAt'])
+    user = credits['userId'].to_numpy()
+    amount = credits['amount'].astype(float).to_numpy()
+
+    local = at.dt.tz_localize(None) if at.dt.tz is not None else at
+    week = (local.dt.normalize() - pd.to_timedelta(local.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+    weekly = (pd.DataFrame({'userId': user, 'week': week.to_numpy(), 'pay': amount})
+              .groupby(['userId', 'week'], as_index=False)['pay'].sum())
+
+    ref = pd.Timestamp(now)
+    if at.dt.tz is None:
+        ref = ref.tz_localize(None)
+    age = (ref - at).to_numpy()
+    month = np.timedelta64(30, 'D')
+    period = age // month
+    in_period = (age >= np.timedelta64(0)) & (period < 3) & (age - period * month <= np.timedelta64(29, 'D'))
+
+    monthly = (pd.DataFrame({'userId': user[in_period], 'period': period[in_period], 'amount': amount[in_period]})
+               .groupby(['userId', 'period'])['amount'].agg(['max', 'sum'])
+               .unstack('period')
+               .reindex(columns=pd.MultiIndex.from_product([['max', 'sum'], range(3)]), fill_value=0.0)
+               .fillna(0.0))
+    monthly.columns = [f'month_{i}_{"max" if agg == "max" else "total"}' for agg, i in monthly.columns]
+    return weekly, monthly.reset_index()
+
+
+def pay_result(credits, now, user_ids):
+    """입금 거래 -> 주급 / 월급 / 비정기급 룰 컬럼 (UserBsResult 필드명, user_ids 순서)"""
+    weekly, monthly = pay_bins(credits, now)
+    return pd.concat([weekly_pay_result(weekly, user_ids), monthly_pay_result(monthly, user_ids)], axis=1)
+
+
+def weekly_pay_result(weekly, user_ids):
+    """
+    주별 입금 합계 (userId, week, pay) -> week_{i}_weekday / week_{i}_pay, weekly_pay_success.
+    슬롯은 입금이 있었던 주를 오래된 순으로 WEEK_SLOTS 개.
+    """
+    weekly = weekly.sort_values(['userId', 'week'], ignore_index=True)
+    weekly['slot'] = weekly.groupby('userId').cumcount()
+    slots = weekly[weekly['slot'] < WEEK_SLOTS].pivot(index='userId', columns='slot', values=['week', 'pay'])
+    slots = slots.reindex(columns=pd.MultiIndex.from_product([['week', 'pay'], range(WEEK_SLOTS)]))
+    slots.columns = [f'week_{i}_{"weekday" if field == "week" else "pay"}' for field, i in slots.columns]
+
+    sufficient = (weekly['pay'] >= 500000).groupby(weekly['userId']).sum()  # 5,000 나이라
+    res = slots.reindex(list(user_ids)).reset_index(drop=True)
+    res = res[[f'week_{i}_{field}' for i in range(WEEK_SLOTS) for field in ('weekday', 'pay')]]
+    res['weekly_pay_success'] = sufficient.reindex(list(user_ids), fill_value=0).to_numpy() >= 12
+    return res
+
+
+def monthly_pay_result(monthly, user_ids):
+    """30일 구간별 최대 / 합계 입금 -> month_{i}_pay, monthly_pay_success, occasional_pay_success"""
+    monthly = by_user(monthly, user_ids, [f'month_{i}_{name}' for i in range(3) for name in ('max', 'total')], fill=0.0)
+    maxes = monthly[[f'month_{i}_max' for i in range(3)]].to_numpy()
+    totals = monthly[[f'month_{i}_total' for i in range(3)]].to_numpy()
+
+    res = pd.DataFrame({f'month_{i}_pay': maxes[:, i] for i in range(3)})
+    res['monthly_pay_success'] = (maxes >= 2000000).sum(axis=1) >= 3  # 20,000 나이라
+    res['occasional_pay_success'] = (totals >= 20000000).sum(axis=1) >= 3  # 200,000 나이라
+    return res
+
+
+def gambling_result(gambling, total_date_count, user_ids):
+    """도박 카테고리 집계 + 전체 일수 -> 도박 룰 1, 2"""
+    gambling = by_user(gambling, user_ids, ['spend_count', 'spend_amount', 'deposit_amount'], fill=0)
+    spend_count = gambling['spend_count'].to_numpy(dtype=float)
+    spend_amount = gambling['spend_amount'].to_numpy(dtype=float)
+    deposit_amount = gambling['deposit_amount'].to_numpy(dtype=float)
+    days = np.asarray(total_date_count, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average_spend = np.where(spend_count > 0, spend_amount / spend_count, 0.0)
+        per_month = lambda v: np.where(days > 0, v / days * 30, 0.0)
+        month_spend_count = np.where(spend_count > 0, per_month(spend_count), 0.0)
+        month_deposit_amount = per_month(deposit_amount)
+        month_spend_amount = per_month(spend_amount)
+
+    return pd.DataFrame({
+        'gambling_average_spend_amount': average_spend,
+        'gambling_month_average_spend_count': month_spend_count,
+        'gambling_rule_1_success': (spend_count == 0) | (average_spend < 500000) | (month_spend_count < 10),
+        'gambling_month_average_deposit_amount': month_deposit_amount,
+        'gambling_month_average_spend_amount': month_spend_amount,
+        'gambling_rule_2_success': month_spend_amount - month_deposit_amount >= 2000000,
+    })
+
+
+def merchant_pattern(merchants):
+    """업체 이름 목록 -> 한 번만 컴파일한 alternation 정규식 (긴 이름 먼저)"""
+    names = sorted({name.lower() for name in merchants}, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(name) for name in names), re.IGNORECASE)
+
+
+GAMBLING_PATTERN = merchant_pattern(GAMBLING_MERCHANTS)
+
+
+def match_texts(texts, pattern):
+    """
+    문자열 배열 -> pattern 매칭 여부 bool 배열.
+    pyarrow 가 있으면 string[pyarrow] 로 바꿔 RE2 로 한 번에 매칭하고,
+    pyarrow 가 없거나 RE2 가 지원하지 않는 문법 (lookaround 등) 이면 파이썬 re 로 매칭한다.
+    """
+    texts = pd.Series(texts, dtype=object)
+    try:
+        matched = texts.astype('string[pyarrow]').str.contains(
+            pattern.pattern, case=not pattern.flags & re.IGNORECASE, regex=True)
+    except (ImportError, ValueError):
+        matched = texts.str.contains(pattern, regex=True)
+    return matched.to_numpy(dtype=bool, na_value=False)
+
+
+def classify_narrations(narrations, pattern=GAMBLING_PATTERN, category='gambling'):
+    """
+    narration 배열 -> 행별 카테고리 (매칭되면 category, 아니면 None).
+    factorize 로 서로 다른 narration 만 뽑아 정규식을 한 번에 돌리고,
+    코드 배열 인덱싱으로 전체 행에 다시 펼친다 (NaN narration 은 None).
+    narration -> 카테고리 표는 호출 안에서만 쓴다 (narration 은 거의 다 달라 전역 캐시는 계속 커지기만 함).
+    """
+    codes, uniques = pd.factorize(pd.Series(narrations, dtype=object))
+
+    table = np.empty(len(uniques) + 1, dtype=object)
+    table[:-1] = np.where(match_texts(uniques, pattern), category, None)
+    table[-1] = None  # code -1 (NaN)
+    return table[codes]
+
+
+def gambling_totals(transactions, pattern=GAMBLING_PATTERN):
+    """
+    GAMBLING_TRANSACTIONS_QUERY 결과 -> GAMBLING_QUERY 와 같은 유저별 집계.
+    도박 거래 = 도박 카테고리가 붙었거나 narration 이 pattern 에 매칭된 거래.
+    """
+    is_gambling = (transactions['categorized'].fillna(False).to_numpy(dtype=bool) |
+                   (classify_narrations(transactions['narration'], pattern) == 'gambling'))
+    is_debit = transactions['type'].to_numpy() == 'debit'
+    amount = transactions['amount'].to_numpy(dtype=float)
+
+    rows = pd.DataFrame({
+        'userId': transactions['userId'].to_numpy(),
+        'spend_count': is_gambling & is_debit,
+        'spend_amount': np.where(is_gambling & is_debit, amount, 0.0),
+        'deposit_amount': np.where(is_gambling & ~is_debit, amount, 0.0),
+    })
+    return rows[is_gambling].groupby('userId', as_index=False).sum()
+
+
+def fetch_gambling_totals(conn, params, pattern=GAMBLING_PATTERN, chunksize=GAMBLING_CHUNK_ROWS):
+    """
+    GAMBLING_TRANSACTIONS_QUERY 를 chunksize 행씩 읽어 청크마다 gambling_totals 를 구하고
+    유저별로 더한다 (거래 전체를 한 DataFrame 으로 올리지 않음).
+    """
+    totals = pd.DataFrame(columns=['userId', 'spend_count', 'spend_amount', 'deposit_amount'])
+    for frame in fetch_frames(conn, GAMBLING_TRANSACTIONS_QUERY, params, chunksize):
+        part = gambling_totals(frame, pattern)
+        totals = part if totals.empty else (
+            pd.concat([totals, part], ignore_index=True).groupby('userId', as_index=False).sum())
+    return totals
+
+
+def cb_result(cb, now, user_ids):
+    """CB_QUERY 결과 -> CbResult 컬럼 (credit_history 가 없는 유저는 get_cb_result 와 같은 기본값)"""
+    cb = by_user(cb, user_ids, [c for c in cb.columns if c != 'userId'])
+    for col in ['total_lost_count', 'recent_loan_count', 'lost_institution_count', 'recent_small_lost_count']:
+        cb[col] = cb[col].fillna(0).astype(int)
+
+    first_loan_at = pd.to_datetime(cb['first_loan_at'])
+    # get_cb_result 의 int(...) 처럼 소수점은 버린다 (12000.50 -> 12000)
+    first_loan_amount = np.trunc(pd.to_numeric(cb['first_loan_amount'])).astype('Int64')
+    first_loan_lost_success = (
+        first_loan_at.isna()
+        | (cb['first_loan_status'] != 'lost')
+        | (first_loan_at < pd.Timestamp((now - timedelta(days=365)).date()))
+        | (first_loan_amount > 15000).fillna(False).astype(bool)
+        | ((cb['first_loan_institution'] == 'aella financial solution ltd') & (cb['first_loan_bureau'] == 'crc'))
+    )
+    return pd.DataFrame({
+        'total_lost_count': cb['total_lost_count'],
+        'recent_loan_success': (cb['total_lost_count'] == 0) | (cb['recent_loan_count'] >= 2),
+        'recent_loan_count': cb['recent_loan_count'],
+        'lost_institution_success': cb['lost_institution_count'] < 4,
+        'lost_institution_count': cb['lost_institution_count'],
+        'recent_small_lost_success': cb['recent_small_lost_count'] == 0,
+        'recent_small_lost_count': cb['recent_small_lost_count'],
+        'first_loan_lost_success': first_loan_lost_success,
+        'first_loan_at': cb['first_loan_at'],
+        'first_loan_amount': first_loan_amount,
+    })
+
+
+def rule_mart_params(now, user_ids):
+    """build_rule_mart 쿼리 공통 파라미터 (노트북과 같은 날짜 경계)"""
+    params = {
+        'user_ids': list(user_ids),
+        'since_30': start_of_day(now - timedelta(days=30)).strftime('%Y-%m-%dT00:00:00%z'),
+        'since_90': start_of_day(now - timedelta(days=90)).strftime('%Y-%m-%dT00:00:00%z'),
+        'today': now.strftime('%Y-%m-%d'),
+        'one_year_ago': (now - timedelta(days=365)).strftime('%Y-%m-%d'),
+        'two_years_ago': (now - timedelta(days=730)).strftime('%Y-%m-%d'),
+    }
+    return params
+
+
+def build_rule_mart(conn, now, users=None, classify_narration=False):
+    """
+    get_user_df(users) 와 같은 룰 마트 DataFrame 을 유저 수와 무관한 쿼리 몇 번으로 만든다.
+    users: USER_COLUMNS 를 가진 DataFrame (기본: get_users_frame)
+    cb_done 이 아닌 유저의 CB 컬럼은 비워 둔다 (NaN).
+    classify_narration: 도박 거래를 카테고리 + narration 매칭으로 판정 (gambling_totals)
+    """
+    if users is None:
+        users = get_users_frame(conn)
+    users = users.reset_index(drop=True)
+    user_ids = users['id'].tolist()
+    if not user_ids:
+        return pd.DataFrame(columns=USER_COLUMNS + BS_COLUMNS + CB_COLUMNS)
+
+    params = rule_mart_params(now, user_ids)
+    start_date, _ = balance_window(now)
+
+    activity = by_user(fetch_frame(conn, ACTIVITY_QUERY, params), user_ids,
+                       ['recent_90_spending_count', 'recent_30_spending_count',
+                        'recent_data_date', 'oldest_transaction_day'])
+    balances = balance_matrix(get_daily_balances(conn, now, user_ids), user_ids, start_date)
+    credits = fetch_frame(conn, PAY_CREDITS_QUERY, params)
+    if classify_narration:
+        gambling = fetch_gambling_totals(conn, params)
+    else:
+        gambling = fetch_frame(conn, GAMBLING_QUERY, params)
+    cb = fetch_frame(conn, CB_QUERY, params)
+
+    recent_90 = activity['recent_90_spending_count'].fillna(0).astype(int)
+    recent_30 = activity['recent_30_spending_count'].fillna(0).astype(int)
+    bs = pd.DataFrame({
+        'has_recent_data': recent_30 > 0,
+        'recent_data_date': activity['recent_data_date'],
+        'recent_90_spending_success': recent_90 >= 20,
+        'recent_90_spending_count': recent_90,
+        'recent_30_spending_success': recent_30 >= 5,
+        'recent_30_spending_count': recent_30,
+    })
+
+    # 가장 오래된 거래일부터 오늘까지의 "전체 일수"
+    oldest = pd.to_datetime(activity['oldest_transaction_day'], utc=True)
+    total_date_count = (pd.Timestamp(start_of_day(now)) - oldest).dt.days.fillna(0).astype(int)
+
+    bs = pd.concat([
+        bs,
+        balance_result(balances),
+        pay_result(credits, now, user_ids),
+        gambling_result(gambling, total_date_count, user_ids),
+    ], axis=1)
+
+    cb = cb_result(cb, now, user_ids).where(users['cb_done'].astype(bool), axis=0)
+
+    return pd.concat([users[USER_COLUMNS], bs[BS_COLUMNS], cb[CB_COLUMNS]], axis=1)
+
+
+# ---------------------------------------------------------------------------
+# 증분 갱신 (유저별 high-water mark)
+# ---------------------------------------------------------------------------
+
+MART_PATH = 'rule_mart.parquet'
+
+# 마트 행마다 붙는 갱신 정보
+#   tx_watermark : 그 유저 bank_transaction 의 max "transactionAt"
+#   cb_watermark : 그 유저 credit_history 의 max "reportedAt"
+#   computed_at  : 그 행을 계산한 now
+MART_META_COLUMNS = ['tx_watermark', 'cb_watermark', 'computed_at']
+
+# 새 행이 없어도 이 일수가 지난 행은 다시 계산한다.
+# 최근 30 / 90일, 전체 일수 같은 값은 시간이 지나기만 해도 바뀌기 때문 (None 이면 안 함)
+MART_MAX_AGE_DAYS = 7
+
+# 유저별 현재 watermark
+WATERMARK_QUERY = '''
+    WITH "tx" AS (
+        SELECT "ba"."userId", MAX("bt"."transactionAt") AS "tx_watermark"
+        FROM "bank_transaction" "bt"
+        INNER JOIN "bank_account" "ba" ON "ba"."id" = "bt"."bankAccountId"
+        WHERE "ba"."userId" = ANY(%(user_ids)s)
+        GROUP BY "ba"."userId"
+    ), "cb" AS (
+        SELECT "userId", MAX("reportedAt") AS "cb_watermark"
+        FROM "credit_history"
+        WHERE "userId" = ANY(%(user_ids)s)
+        GROUP BY "userId"
+    )
+    SELECT COALESCE("tx"."userId", "cb"."userId") AS "userId", "tx"."tx_watermark", "cb"."cb_watermark"
+    FROM "tx"
+    FULL OUTER JOIN "cb" ON "cb"."userId" = "tx"."userId"
+'''
+
+# 저장된 유저별 watermark 보다 새로운 행이 있는 유저와 그 새 watermark.
+# 계좌마다 자기 watermark 이후 구간만 읽으므로 비용은 새로 들어온 행 수에 비례한다.
+CHANGED_WATERMARK_QUERY = '''
+    WITH "prev" AS (
+        SELECT
+            unnest(%(user_ids)s::bigint[]) AS "userId",
+            unnest(%(tx_marks)s::timestamptz[]) AS "tx_watermark",
+            unnest(%(cb_marks)s::timestamp[]) AS "cb_watermark"
+    ), "tx" AS (
+        SELECT "p"."userId", MAX("bt"."transactionAt") AS "tx_watermark"
+        FROM "prev" "p"
+        INNER JOIN "bank_account" "ba" ON "ba"."userId" = "p"."userId"
+        INNER JOIN "bank_transaction" "bt" ON "bt"."bankAccountId" = "ba"."id"
+        WHERE "p"."tx_watermark" IS NULL OR "bt"."transactionAt" > "p"."tx_watermark"
+        GROUP BY "p"."userId"
+    ), "cb" AS (
+        SELECT "p"."userId", MAX("ch"."reportedAt") AS "cb_watermark"
+        FROM "prev" "p"
+        INNER JOIN "credit_history" "ch" ON "ch"."userId" = "p"."userId"
+        WHERE "p"."cb_watermark" IS NULL OR "ch"."reportedAt" > "p"."cb_watermark"
+        GROUP BY "p"."userId"
+    )
+    SELECT COALESCE("tx"."userId", "cb"."userId") AS "userId", "tx"."tx_watermark", "cb"."cb_watermark"
+    FROM "tx"
+    FULL OUTER JOIN "cb" ON "cb"."userId" = "tx"."userId"
+'''
+
+
+def watermark_frame(marks):
+    """watermark 쿼리 결과 -> index=userId, tx_watermark(UTC) / cb_watermark"""
+    marks['tx_watermark'] = pd.to_datetime(marks['tx_watermark'], utc=True)
+    marks['cb_watermark'] = pd.to_datetime(marks['cb_watermark'])
+    return marks.set_index('userId')
+
+
+def fetch_watermarks(conn, user_ids):
+    """user_ids 의 현재 (tx_watermark, cb_watermark)"""
+    return watermark_frame(fetch_frame(conn, WATERMARK_QUERY, {'user_ids': list(user_ids)}))
+
+
+def fetch_changed_watermarks(conn, mart):
+    """마트에 저장된 watermark 이후 거래 / CB 행이 생긴 유저만 새 watermark 와 함께"""
+    def as_list(values):
+        return [None if pd.isna(v) else v.to_pydatetime() for v in values]
+
+    if mart.empty:
+        return watermark_frame(pd.DataFrame(columns=['userId', 'tx_watermark', 'cb_watermark']))
+
+    params = {
+        'user_ids': mart['id'].tolist(),
+        'tx_marks': as_list(pd.to_datetime(mart['tx_watermark'], utc=True)),
+        'cb_marks': as_list(pd.to_datetime(mart['cb_watermark'])),
+    }
+    return watermark_frame(fetch_frame(conn, CHANGED_WATERMARK_QUERY, params))
+
+
+def load_mart(path=MART_PATH):
+    """저장된 마트 (없으면 None)"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def save_mart(mart, path=MART_PATH):
+    """tmp 파일에 쓰고 바꿔치기 (중간에 죽어도 이전 마트는 남음)"""
+    tmp_path = path + '.tmp'
+    mart.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def user_columns_changed(users, mart):
+    """get_users 컬럼 (bs_success, cb_done ...) 값이 마트와 달라진 유저 id"""
+    prev = mart.set_index('id')[USER_COLUMNS[1:]]
+    cur = users.set_index('id')[USER_COLUMNS[1:]]
+    common = cur.index.intersection(prev.index)
+    cur, prev = cur.loc[common].astype(object), prev.loc[common].astype(object)
+    same = (cur == prev) | (cur.isna() & prev.isna())
+    return set(common[~same.all(axis=1)])
+
+
+def stale_users(conn, users, mart, now, max_age_days=MART_MAX_AGE_DAYS):
+    """
+    다시 계산할 유저 id 집합.
+      - 마트에 없는 유저
+      - get_users 컬럼이 바뀐 유저
+      - 저장된 watermark 이후 거래 / CB 행이 생긴 유저
+      - computed_at 이 max_age_days 보다 오래된 유저
+    transactionAt 이 watermark 보다 과거인 행이 뒤늦게 들어온 경우는
+    max_age_days 주기의 재계산에서 반영된다.
+    """
+    user_ids = set(users['id'])
+    stale = user_ids - set(mart['id'])
+    stale |= user_columns_changed(users, mart)
+    stale |= set(fetch_changed_watermarks(conn, mart[mart['id'].isin(user_ids)]).index)
+
+    if max_age_days is not None:
+        computed_at = pd.to_datetime(mart['computed_at'], utc=True)
+        too_old = computed_at < pd.Timestamp(now) - pd.Timedelta(days=max_age_days)
+        stale |= set(mart.loc[too_old.to_numpy(), 'id']) & user_ids
+    return stale
+
+
+def refresh_rule_mart(conn, now, path=MART_PATH, max_age_days=MART_MAX_AGE_DAYS, full=False,
+                      classify_narration=False):
+    """
+    마트 파일을 증분 갱신하고 전체 마트를 반환.
+    stale_users 에 해당하는 유저만 build_rule_mart 로 다시 계산해 upsert 하고,
+    get_users 에서 빠진 유저는 마트에서도 지운다. 마트 파일이 없거나 full 이면 전체 계산.
+    """
+    users = get_users_frame(conn)
+    mart = None if full else load_mart(path)
+    if mart is None:
+        refresh_ids = set(users['id'])
+    else:
+        refresh_ids = stale_users(conn, users, mart, now, max_age_days)
+
+    refresh_users = users[users['id'].isin(refresh_ids)].reset_index(drop=True)
+    # watermark 를 먼저 읽어야 계산 도중 들어온 행이 다음 실행에서 빠지지 않는다
+    marks = fetch_watermarks(conn, user_ids=refresh_users['id'].tolist())
+    rebuilt = build_rule_mart(conn, now, refresh_users, classify_narration)
+    rebuilt['tx_watermark'] = marks['tx_watermark'].reindex(rebuilt['id']).to_numpy()
+    rebuilt['cb_watermark'] = marks['cb_watermark'].reindex(rebuilt['id']).to_numpy()
+    rebuilt['computed_at'] = pd.Timestamp(now).tz_convert('UTC')
+
+    if mart is not None:
+        kept = mart[mart['id'].isin(set(users['id']) - refresh_ids)]
+        rebuilt = pd.concat([kept, rebuilt], ignore_index=True) if len(kept) else rebuilt
+    mart = rebuilt.sort_values('id', ignore_index=True)
+
+    save_mart(mart, path)
+    print(f"[rule_mart] {len(refresh_users)}/{len(users)}명 재계산 -> {path}")
+    return mart
+
+
+# ---------------------------------------------------------------------------
+# 컬럼형 결과 컨테이너
+# ---------------------------------------------------------------------------
+
+# dataclass 필드 타입 -> 배열 dtype (그 외 / Optional 은 object)
+FIELD_DTYPES = {bool: bool, int: np.int64, float: np.float64}
+
+
+def field_dtypes(*classes, **overrides):
+    """
+    dataclass 들의 필드 -> {필드 이름: numpy dtype} (선언 순서대로 이어 붙임).
+    overrides: 선언 타입과 실제 값 타입이 다른 필드의 dtype (예: lost_institution_success=bool)
+    """
+    dtypes = {field.name: FIELD_DTYPES.get(field.type, object)
+              for cls in classes for field in dataclasses.fields(cls)}
+    dtypes.update(overrides)
+    return dtypes
+
+
+def row_dict(frame, index=0):
+    """결과 DataFrame 의 한 행 -> {컬럼: 값}. NaN / NaT 는 dataclass 필드처럼 None 으로 (ResultColumns 에서 빈 칸)"""
+    return {name: None if pd.isna(value) else value for name, value in frame.iloc[index].items()}
+
+
+class ResultRow:
+    """ResultColumns 의 한 행. 속성 읽기 / 쓰기가 그대로 컬럼 배열의 i 번째 칸으로 간다."""
+    __slots__ = ('_result', '_index')
+
+    def __init__(self, result, index):
+        object.__setattr__(self, '_result', result)
+        object.__setattr__(self, '_index', index)
+
+    def __getattr__(self, name):
+        if name not in self._result.arrays:
+            raise AttributeError(name)
+        return self._result.get(self._index, name)
+
+    def __setattr__(self, name, value):
+        self._result.set(self._index, **{name: value})
+
+    def to_dict(self):
+        return {name: self._result.get(self._index, name) for name in self._result.arrays
+                if not self._result.missing[name][self._index]}
+
+
+class ResultColumns:
+    """
+    행 n 개짜리 결과를 필드별 numpy 배열로 미리 할당해 두고 채우는 컨테이너.
+    set 의 index 는 정수(한 행) 또는 slice / 배열(여러 행). 값이 None 인 필드는
+    건너뛰므로 (dataclass.to_dict 와 같음) 채우지 않은 칸은 to_frame 에서 NaN / None 이 된다.
+    """
+
+    def __init__(self, dtypes, n):
+        self.n = n
+        self.arrays = {name: np.full(n, np.nan) if np.dtype(dtype) == np.float64 else np.zeros(n, dtype=dtype)
+                       for name, dtype in dtypes.items()}
+        self.missing = {name: np.ones(n, dtype=bool) for name in dtypes}
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return (ResultRow(self, i) for i in range(self.n))
+
+    def row(self, index):
+        return ResultRow(self, index)
+
+    def get(self, index, name):
+        return None if self.missing[name][index] else self.arrays[name][index]
+
+    def set(self, index, **values):
+        for name, value in values.items():
+            if value is None:
+                continue
+            self.arrays[name][index] = value
+            self.missing[name][index] = False
+
+    def to_frame(self):
+        columns = {}
+        for name, values in self.arrays.items():
+            missing = self.missing[name]
+            if missing.any() and values.dtype.kind in 'iu':
+                # pd.DataFrame(dict 리스트) 와 같이 빈 칸이 있는 정수 컬럼은 float + NaN
+                values = values.astype(np.float64)
+                values[missing] = np.nan
+            elif missing.any() and values.dtype != np.float64:
+                values = values.astype(object)
+                values[missing] = None
+            columns[name] = values
+        return pd.DataFrame(columns, index=pd.RangeIndex(self.n))
@@ -0,0 +1,538 @@
+"""
+trusty DB 공용 접속 모듈 (SSH 터널 1개 + 커넥션 풀).
+
+노트북마다 SSHTunnelForwarder + psycopg2.connect 를 새로 만드는 대신
+프로세스 안에서 터널 하나를 유지하고 PooledDB 풀에서 커넥션을 빌려 쓴다.
+
+  - 터널은 HEALTH_CHECK_SECONDS 마다 살아 있는지 확인하고, 끊겼으면 다시 열고 풀도 새로 만든다
+  - 연결 오류(OperationalError / InterfaceError)가 나면 reconnect 후 한 번 더 시도
+    (statement_timeout 같은 쿼리 취소는 연결 오류로 보지 않고 바로 올린다)
+  - 여러 쿼리를 병렬로 돌릴 때(bulk_fetch)도 스레드마다 풀의 커넥션을 재사용
+
+접속 정보는 환경 변수에서 읽는다 (비밀번호는 코드에 두지 않는다).
+
+    TRUSTY_SSH_HOST, TRUSTY_SSH_USER, TRUSTY_SSH_PKEY   (TRUSTY_SSH_HOST='' 이면 터널 없이 직접 접속)
+    TRUSTY_DB_HOST, TRUSTY_DB_PORT, TRUSTY_DB_NAME, TRUSTY_DB_USER, TRUSTY_DB_PASSWORD
+    TRUSTY_DB_POOL_SIZE
+
+    import trusty_db
+
+    rows = trusty_db.run_query('SELECT ... WHERE "userId" = %s', (user_id,))
+    for chunk in trusty_db.stream_query('SELECT * FROM "credit_history" ORDER BY "userId"'):
+        ...
+    frames = trusty_db.bulk_fetch({'users': (USERS_QUERY, None), 'cb': (CB_QUERY, params)})
+    trusty_db.export_query('SELECT * FROM "credit_history"', 'credit_history.parquet')
+
+    with trusty_db.connection() as conn:      # rule_mart 처럼 conn 을 받는 함수용
+        mart = build_rule_mart(conn, now)
+
+큰 결과는 fetchall 대신 서버 사이드 커서로 청크씩 받는다 (iter_chunks). 청크는 DataFrame
+(stream_query) 이나 cursor.description 의 타입으로 만든 Arrow RecordBatch (stream_batches)
+로 받거나, CSV / Parquet 파일에 바로 이어 쓴다 (export_query). 클라이언트 메모리는
+테이블 크기와 무관하게 청크 하나 크기로 유지된다. 노트북에서 직접 연 conn 으로도 쓸 수 있다.
+
+    write_batches(iter_record_batches(conn, qry), 'credit_history_result.csv')
+
+파일로 그대로 내보낼 때는 COPY (query) TO STDOUT WITH CSV 로 서버가 만든 CSV 바이트를
+파일에 바로 흘려 쓴다 (파이썬 행 객체를 만들지 않음). Parquet 은 COPY 출력을 pipe 로
+Arrow CSV 리더에 넘겨 스트리밍으로 변환한다 (컬럼 타입은 쿼리의 description 기준).
+
+    copy_to_csv(conn, qry, '부실그룹 파악.csv')
+    trusty_db.copy_export(qry, 'credit_history.parquet')
+"""
+import atexit
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from dbutils.pooled_db import PooledDB
+from sshtunnel import SSHTunnelForwarder
+
+# 환경 변수가 없을 때의 기본값 (비밀번호는 기본값 없음)
+DEFAULT_CONFIG = {
+    'ssh_host': 'api.trustyapp.io',
+    'ssh_port': 22,
+    'ssh_user': 'ubuntu',
+    'ssh_pkey': 'ng-prod.pem',
+    'db_host': '127.0.0.1',  # SSH 터널 기준 원격 DB 주소
+    'db_port': 5432,
+    'db_name': 'trusty',
+    'db_user': 'server',
+    'db_password': None,
+    'pool_size': 8,
+}
+
+# {설정 키: 환경 변수 이름}
+CONFIG_ENV = {
+    'ssh_host': 'TRUSTY_SSH_HOST',
+    'ssh_port': 'TRUSTY_SSH_PORT',
+    'ssh_user': 'TRUSTY_SSH_USER',
+    'ssh_pkey': 'TRUSTY_SSH_PKEY',
+    'db_host': 'TRUSTY_DB_HOST',
+    'db_port': 'TRUSTY_DB_PORT',
+    'db_name': 'TRUSTY_DB_NAME',
+    'db_user': 'TRUSTY_DB_USER',
+    'db_password': 'TRUSTY_DB_PASSWORD',
+    'pool_size': 'TRUSTY_DB_POOL_SIZE',
+}
+
+# 터널 상태를 다시 확인하기까지의 간격 (초)
+HEALTH_CHECK_SECONDS = 30
+
+# 연결 오류 시 reconnect 후 재시도 횟수
+RETRIES = 1
+
+# stream_query 기본 청크 크기 (행)
+DEFAULT_CHUNKSIZE = 100_000
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+# statement_timeout 등으로 취소된 쿼리. OperationalError 의 하위 클래스지만 연결은 멀쩡하므로 재시도하지 않는다
+QUERY_CANCELED = psycopg2.extensions.QueryCanceledError
+
+_lock = threading.RLock()
+_state = {'config': None, 'tunnel': None, 'pool': None, 'checked_at': 0.0}
+_cursor_ids = itertools.count()
+
+
+def db_config(**overrides):
+    """DEFAULT_CONFIG <- 환경 변수 <- overrides 순으로 덮어쓴 접속 설정"""
+    config = dict(DEFAULT_CONFIG)
+    for key, env in CONFIG_ENV.items():
+        if env in os.environ:
+            config[key] = os.environ[env]
+    config.update(overrides)
+    for key in ['ssh_port', 'db_port', 'pool_size']:
+        config[key] = int(config[key])
+    if not config['db_password']:
+        raise RuntimeError(f"DB 비밀번호가 없습니다: {CONFIG_ENV['db_password']} 환경 변수를 설정하세요")
+    return config
+
+
+def configure(**overrides):
+    """접속 설정을 바꾼다. 열려 있던 터널 / 풀은 닫고 다음 사용 때 새 설정으로 연다."""
+    with _lock:
+        close()
+        _state['config'] = db_config(**overrides)
+
+
+def tunnel_alive(tunnel):
+    """터널 스레드가 돌고 있고 포워딩이 실제로 열려 있는지"""
+    if tunnel is None or not tunnel.is_active:
+        return False
+    tunnel.check_tunnels()
+    return all(tunnel.tunnel_is_up.values())
+
+
+def _open_tunnel(config):
+    tunnel = SSHTunnelForwarder(
+        (config['ssh_host'], config['ssh_port']),
+        ssh_username=config['ssh_user'],
+        ssh_pkey=config['ssh_pkey'],
+        remote_bind_address=(config['db_host'], config['db_port']),
+        set_keepalive=10,
+    )
+    tunnel.start()
+    return tunnel
+
+
+def _open_pool(config, host, port):
+    return PooledDB(
+        creator=psycopg2,
+        mincached=1,
+        maxconnections=config['pool_size'],
+        blocking=True,  # 풀이 다 차면 반납될 때까지 기다림
+        reset=True,     # 반납 시 rollback
+        host=host,
+        port=port,
+        user=config['db_user'],
+        password=config['db_password'],
+        database=config['db_name'],
+    )
+
+
+def get_pool():
+    """살아 있는 터널 위의 커넥션 풀 (필요하면 터널 / 풀을 새로 연다)"""
+    with _lock:
+        if _state['config'] is None:
+            _state['config'] = db_config()
+        config = _state['config']
+
+        now = time.monotonic()
+        if _state['pool'] is not None and now - _state['checked_at'] < HEALTH_CHECK_SECONDS:
+            return _state['pool']
+
+        if not config['ssh_host']:
+            if _state['pool'] is None:
+                _state['pool'] = _open_pool(config, config['db_host'], config['db_port'])
+        elif _state['pool'] is None or not tunnel_alive(_state['tunnel']):
+            close()
+            _state['tunnel'] = _open_tunnel(config)
+            _state['pool'] = _open_pool(config, '127.0.0.1', _state['tunnel'].local_bind_port)
+        _state['checked_at'] = now
+        return _state['pool']
+
+
+def reconnect():
+    """터널 / 풀을 닫고 다시 연다"""
+    with _lock:
+        close()
+        return get_pool()
+
+
+def close():
+    """풀의 커넥션과 터널을 닫는다 (프로세스 종료 시 자동 호출)"""
+    with _lock:
+        pool, tunnel = _state['pool'], _state['tunnel']
+        _state.update(pool=None, tunnel=None, checked_at=0.0)
+    if pool is not None:
+        pool.close()
+    if tunnel is not None:
+        tunnel.stop()
+
+
+atexit.register(close)
+
+
+def connect():
+    """풀에서 커넥션 하나를 빌린다. close() 하면 풀로 반납된다."""
+    return get_pool().connection()
+
+
+@contextmanager
+def connection():
+    """with 블록 동안 풀 커넥션을 빌려 쓴다"""
+    conn = connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def with_retry(fn):
+    """
+    fn(conn) 을 풀 커넥션으로 실행. 연결 오류면 reconnect 후 RETRIES 번까지 다시 시도.
+    쿼리 취소 (QUERY_CANCELED) 는 터널을 다시 열지 않고 그대로 올린다 (느린 쿼리를 또 돌리지 않음).
+    (실패한 트랜잭션은 풀 반납 시 reset=True 로 rollback 된다)
+    """
+    for attempt in range(RETRIES + 1):
+        try:
+            with connection() as conn:
+                return fn(conn)
+        except QUERY_CANCELED:
+            raise
+        except CONNECTION_ERRORS:
+            if attempt == RETRIES:
+                raise
+            reconnect()
+
+
+def run_query(qry, params=None):
+    """쿼리 결과 행 목록 (노트북의 run_query 와 같은 반환값)"""
+    def fetch(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(qry, params)
+            return cursor.fetchall()
+    return with_retry(fetch)
+
+
+def query_frame(qry, params=None):
+    """쿼리 결과를 DataFrame 으로"""
+    def fetch(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(qry, params)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+        return pd.DataFrame(rows, columns=columns)
+    return with_retry(fetch)
+
+
+def bulk_fetch(queries, max_workers=None):
+    """
+    {이름: (쿼리, 파라미터)} -> {이름: DataFrame}.
+    쿼리마다 풀 커넥션을 하나씩 빌려 max_workers (기본: 풀 크기) 개씩 병렬로 실행한다.
+    """
+    if max_workers is None:
+        get_pool()
+        max_workers = _state['config']['pool_size']
+    names = list(queries)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = executor.map(lambda name: query_frame(*queries[name]), names)
+        return dict(zip(names, frames))
+
+
+# ---------------------------------------------------------------------------
+# 서버 사이드 커서 스트리밍 / 파일 export
+# ---------------------------------------------------------------------------
+
+# psycopg2 type_code (PostgreSQL 타입 OID) -> Arrow 타입. 목록에 없는 타입은 문자열로 쓴다.
+PG_ARROW_TYPES = {
+    16: pa.bool_(),                      # boolean
+    20: pa.int64(),                      # bigint
+    21: pa.int16(),                      # smallint
+    23: pa.int32(),                      # integer
+    700: pa.float32(),                   # real
+    701: pa.float64(),                   # double precision
+    1700: pa.float64(),                  # numeric (금액 컬럼)
+    25: pa.string(),                     # text
+    1042: pa.string(),                   # char
+    1043: pa.string(),                   # varchar
+    1082: pa.date32(),                   # date
+    1114: pa.timestamp('us'),            # timestamp
+    1184: pa.timestamp('us', tz='UTC'),  # timestamptz (UTC 로 저장)
+}
+
+# CSV 로 쓸 때 NULL 이 있어도 정수 / bool 이 1.0 / 객체로 바뀌지 않게 nullable dtype 으로
+CSV_PANDAS_TYPES = {
+    pa.bool_(): pd.BooleanDtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+
+def iter_chunks(conn, qry, params=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    named(서버 사이드) 커서로 (cursor.description, 행 목록) 을 chunksize 행씩 yield.
+    fetchmany(chunksize) 는 서버에 FETCH FORWARD chunksize 를 보내므로 (itersize 로 도는
+    for 루프와 같은 동작) 클라이언트에는 한 청크만 올라온다. 결과가 없어도 한 번은 yield 한다.
+    """
+    with conn.cursor(name=f'trusty_stream_{next(_cursor_ids)}') as cursor:
+        cursor.execute(qry, params)
+        first = True
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if rows or first:
+                yield cursor.description, rows
+            if len(rows) < chunksize:
+                break
+            first = False
+
+
+def iter_frames(conn, qry, params=None, chunksize=DEFAULT_CHUNKSIZE):
+    """iter_chunks 를 DataFrame 청크로"""
+    for description, rows in iter_chunks(conn, qry, params, chunksize):
+        yield pd.DataFrame(rows, columns=[desc[0] for desc in description])
+
+
+def arrow_schema(description):
+    """cursor.description -> Arrow 스키마 (PG_ARROW_TYPES)"""
+    return pa.schema([(desc[0], PG_ARROW_TYPES.get(desc[1], pa.string())) for desc in description])
+
+
+def arrow_values(values, type_):
+    """한 컬럼의 파이썬 값 -> pa.array 에 넣을 수 있는 값 (Decimal -> float, 그 외 -> 문자열)"""
+    if pa.types.is_floating(type_):
+        return [None if v is None else float(v) for v in values]
+    if pa.types.is_string(type_):
+        return [v if v is None or isinstance(v, str)
+                else json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (dict, list))
+                else str(v) for v in values]
+    return values
+
+
+def to_record_batch(rows, schema):
+    """행 목록 -> 스키마 타입 그대로의 RecordBatch (DataFrame 을 거치지 않음)"""
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = [pa.array(arrow_values(values, field.type), type=field.type)
+              for values, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_record_batches(conn, qry, params=None, chunksize=DEFAULT_CHUNKSIZE):
+    """iter_chunks 를 Arrow RecordBatch 로 (스키마는 첫 청크의 description 으로 고정)"""
+    schema = None
+    for description, rows in iter_chunks(conn, qry, params, chunksize):
+        if schema is None:
+            schema = arrow_schema(description)
+        yield to_record_batch(rows, schema)
+
+
+def write_batches(batches, path, fmt=None, schema=None):
+    """
+    RecordBatch 스트림을 CSV (utf-8-sig, 노트북 to_csv 와 같은 형식) 또는 Parquet 파일에 이어 쓴다.
+    fmt 기본값은 확장자. schema 를 주면 배치가 하나도 없어도 빈 Parquet 파일을 만든다.
+    임시 파일에 다 쓴 뒤 교체하므로 중간에 실패해도 기존 파일은 남는다.
+    반환: 기록한 행 수
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"지원하지 않는 형식입니다: {fmt} (csv / parquet)")
+
+    tmp_path = f"{path}.tmp"
+    n_rows = 0
+    try:
+        if fmt == 'parquet':
+            writer = None if schema is None else pq.ParquetWriter(tmp_path, schema)
+            try:
+                for batch in batches:
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, batch.schema)
+                    writer.write_batch(batch)
+                    n_rows += batch.num_rows
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+                for i, batch in enumerate(batches):
+                    frame = batch.to_pandas(types_mapper=CSV_PANDAS_TYPES.get)
+                    frame.to_csv(f, index=False, header=(i == 0))
+                    n_rows += batch.num_rows
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return n_rows
+
+
+def stream_query(qry, params=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    풀 커넥션의 서버 사이드 커서로 결과를 chunksize 행씩 DataFrame 으로 yield.
+    스트리밍 중에는 커넥션을 계속 빌려 두며, 중간에 끊기면 재시도하지 않고 오류를 올린다.
+    """
+    with connection() as conn:
+        yield from iter_frames(conn, qry, params, chunksize)
+
+
+def stream_batches(qry, params=None, chunksize=DEFAULT_CHUNKSIZE):
+    """stream_query 의 Arrow RecordBatch 버전"""
+    with connection() as conn:
+        yield from iter_record_batches(conn, qry, params, chunksize)
+
+
+def export_query(qry, path, params=None, fmt=None, chunksize=DEFAULT_CHUNKSIZE):
+    """쿼리 결과를 청크 단위로 CSV / Parquet 파일에 바로 쓴다. 반환: 기록한 행 수"""
+    with connection() as conn:
+        return write_batches(iter_record_batches(conn, qry, params, chunksize), path, fmt)
+
+
+# ---------------------------------------------------------------------------
+# COPY 기반 export
+# ---------------------------------------------------------------------------
+
+# copy_to_parquet 이 COPY 출력에서 한 번에 읽는 바이트 수 (RecordBatch 하나 크기)
+COPY_BLOCK_SIZE = 16 << 20
+
+UTF8_BOM = b'\xef\xbb\xbf'
+
+
+def copy_sql(cursor, qry, params=None, header=True):
+    """쿼리 (+ 파라미터) -> COPY (쿼리) TO STDOUT 문. COPY 는 바인드 파라미터를 못 받으므로 mogrify 로 채운다."""
+    if params is not None:
+        qry = cursor.mogrify(qry, params)
+        qry = qry.decode() if isinstance(qry, bytes) else qry
+    qry = re.sub(r'[\s;]+$', '', qry)
+    options = 'FORMAT csv, HEADER' if header else 'FORMAT csv'
+    return f"COPY ({qry}) TO STDOUT WITH ({options})"
+
+
+def copy_query(conn, qry, out, params=None, header=True):
+    """쿼리 결과를 서버에서 만든 CSV 그대로 out (바이너리 파일 객체) 에 쓴다"""
+    with conn.cursor() as cursor:
+        cursor.copy_expert(copy_sql(cursor, qry, params, header), out)
+
+
+def query_schema(conn, qry, params=None):
+    """
+    쿼리를 LIMIT 0 으로 감싸 실행해 결과 컬럼의 Arrow 스키마만 구한다.
+    결과 컬럼 이름은 서로 달라야 한다 (조인에서 같은 이름이 겹치면 별칭을 붙일 것).
+    """
+    qry = re.sub(r'[\s;]+$', '', qry)
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM ({qry}) AS \"q\" LIMIT 0", params)
+        return arrow_schema(cursor.description)
+
+
+def copy_to_csv(conn, qry, path, params=None, bom=True):
+    """
+    COPY 출력을 파일에 바로 쓴다 (bom: 노트북 to_csv(encoding='utf-8-sig') 처럼 BOM 을 붙임).
+    값 형식은 PostgreSQL CSV 그대로 (bool t/f, NULL = 빈 칸, timestamptz 는 세션 타임존).
+    임시 파일에 다 쓴 뒤 교체한다. 반환: 파일 크기 (바이트)
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as out:
+            if bom:
+                out.write(UTF8_BOM)
+            copy_query(conn, qry, out, params)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def copy_to_parquet(conn, qry, path, params=None, block_size=COPY_BLOCK_SIZE):
+    """
+    COPY 출력을 pipe 로 Arrow CSV 스트리밍 리더에 넘겨 Parquet 으로 바로 쓴다.
+    COPY 는 별도 스레드에서 pipe 에 쓰고, 메인 스레드는 block_size 씩 읽어 RecordBatch 로 변환한다.
+    컬럼 타입은 query_schema (PG_ARROW_TYPES) 를 따르므로 결과 컬럼 이름이 서로 달라야 한다.
+    반환: 기록한 행 수
+    """
+    schema = query_schema(conn, qry, params)
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def produce():
+        try:
+            with open(write_fd, 'wb') as out:
+                copy_query(conn, qry, out, params)
+        except BaseException as error:
+            errors.append(error)
+
+    # COPY 가 중간에 실패해도 잘린 CSV 로 만든 파일이 path 에 남지 않게 따로 쓰고 마지막에 교체
+    part_path = f"{path}.part"
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        with open(read_fd, 'rb') as source:
+            reader = pa_csv.open_csv(
+                source,
+                read_options=pa_csv.ReadOptions(block_size=block_size),
+                # COPY CSV 는 줄바꿈이 든 텍스트를 따옴표로 감싸 그대로 쓴다 (블록 경계에 걸쳐도 한 값으로)
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=schema,
+                    true_values=['t'],
+                    false_values=['f'],
+                    strings_can_be_null=True,          # NULL = 따옴표 없는 빈 칸
+                    quoted_strings_can_be_null=False,  # "" = 빈 문자열
+                ),
+            )
+            n_rows = write_batches(reader, part_path, fmt='parquet', schema=reader.schema)
+        producer.join()
+        if errors:
+            raise errors[0]
+        os.replace(part_path, path)
+    except BaseException as error:
+        producer.join()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        if errors and errors[0] is not error:
+            raise errors[0] from error
+        raise
+    return n_rows
+
+
+def copy_export(qry, path, params=None, fmt=None):
+    """풀 커넥션으로 copy_to_csv / copy_to_parquet (fmt 기본값은 확장자)"""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    with connection() as conn:
+        if fmt == 'csv':
+            return copy_to_csv(conn, qry, path, params)
+        if fmt == 'parquet':
+            return copy_to_parquet(conn, qry, path, params)
+    raise ValueError(f"지원하지 않는 형식입니다: {fmt} (csv / parquet)")
@@ -1,42 +1,11 @@
 import pandas as pd
-import numpy as np
-from itertools import groupby
 
-# 강화된 재무 건전성 평가 함수
-def enhanced_financial_soundness(group):
-    mean_balance = group['balance'].mean()
-    median_balance = group['balance'].median()
-    stable_ratio = (group['balance'] >= median_balance).mean()
-    critical_ratio = (group['balance'] < 500).mean()  # 저 잔고에 집중
-
-    # 조건 강화
-    high_path = mean_balance >= 10000 and median_balance >= 2000
-    stability_path = mean_balance >= 3000 and stable_ratio >= 0.3 and critical_ratio <= 0.15
-    return high_path or stability_path
-
-# 강화된 변동성 패턴 평가 함수
-def enhanced_volatility_patterns(group):
-    balances = group['balance'].values
-    diffs = np.diff(balances)
-    max_consecutive_drops = max((sum(1 for _ in g) for k, g in groupby(diffs < 0) if k), default=0)
-    low_ratio = (balances < 500).mean()  # 저 잔고 비율
-
-    # 조건 강화
-    return max_consecutive_drops <= 15 and low_ratio <= 0.3
+from balance_rules import evaluate_balance_rules
 
 # 규칙 평가 함수
 def evaluate_enhanced_rules(data):
-    enhanced_scores = data.groupby('user_id').apply(
-        lambda group: pd.Series({
-            'enhanced_financial_soundness': enhanced_financial_soundness(group),
-            'enhanced_volatility_patterns': enhanced_volatility_patterns(group),
-        })
-    )
-
-    enhanced_scores['rule_satisfaction'] = (
-        enhanced_scores['enhanced_financial_soundness'] &
-        enhanced_scores['enhanced_volatility_patterns']
-    )
+    # 유저별 groupby.apply 대신 컬럼 단위로 한 번에 평가 (balance_rules 참고)
+    enhanced_scores = evaluate_balance_rules(data)
     
     #enhanced_scores['true_label'] = enhanced_scores.index.isin(positive_cases)
 